@@ -20,13 +20,25 @@ void release_raw_image_wrapper(uint64_t id) {
     ImageManager::instance().release_raw_image(id);
 }
 
-py::bytes get_thumbnail_wrapper(uint64_t id) {
-    ThumbnailData thumb_data = ImageManager::instance().get_thumbnail(id);
-    return py::bytes(thumb_data.data.data(), thumb_data.data.size());
+py::memoryview get_thumbnail_wrapper(uint64_t id) {
+    ThumbnailData thumb_data;
+    {
+        // Decoding the thumbnail doesn't touch any Python objects, so we let
+        // other Python threads run in the meantime.
+        py::gil_scoped_release release;
+        thumb_data = ImageManager::instance().get_thumbnail(id);
+    }
+    // Hand ownership of the buffer to Python and return a read-only view of it,
+    // instead of copying the thumbnail once more into a new bytes object.
+    return py::memoryview(py::cast(std::move(thumb_data)));
 }
 
 py::dict get_metadata_wrapper(uint64_t id) {
-    Metadata meta_data = ImageManager::instance().get_metadata(id);
+    Metadata meta_data;
+    {
+        py::gil_scoped_release release;
+        meta_data = ImageManager::instance().get_metadata(id);
+    }
     py::dict meta;
     meta["make"] = meta_data.make;
     meta["model"] = meta_data.model;
@@ -39,9 +51,22 @@ py::dict get_metadata_wrapper(uint64_t id) {
 
 PYBIND11_MODULE(cpp_backend_python_bindings, m) {
     m.doc() = "C++ backend for MPR Photo Editor using LibRaw";
+
+    // Exposes the thumbnail bytes through the buffer protocol.
+    py::class_<ThumbnailData>(m, "ThumbnailData", py::buffer_protocol())
+        .def_buffer([](ThumbnailData& thumb) -> py::buffer_info {
+            return py::buffer_info(
+                thumb.data.data(), sizeof(char), py::format_descriptor<unsigned char>::format(),
+                static_cast<py::ssize_t>(thumb.data.size()), /*readonly=*/true);
+        });
+
     m.def("get_libraw_version", &get_libraw_version_wrapper, "Returns the LibRaw version string");
-    m.def("load_raw_image", &load_raw_image_wrapper, "Loads a raw image and returns a handle ID");
-    m.def("release_raw_image", &release_raw_image_wrapper, "Releases a raw image handle");
-    m.def("get_thumbnail", &get_thumbnail_wrapper, "Extracts the thumbnail from a raw image");
+    // The GIL is released while LibRaw does the (slow) disk I/O and decoding.
+    // This is safe because ImageManager guards its state with its own mutex.
+    m.def("load_raw_image", &load_raw_image_wrapper, "Loads a raw image and returns a handle ID",
+          py::call_guard<py::gil_scoped_release>());
+    m.def("release_raw_image", &release_raw_image_wrapper, "Releases a raw image handle",
+          py::call_guard<py::gil_scoped_release>());
+    m.def("get_thumbnail", &get_thumbnail_wrapper, "Extracts the thumbnail from a raw image as a read-only memoryview");
     m.def("get_metadata", &get_metadata_wrapper, "Extracts metadata from a raw image");
 }
@@ -5,15 +5,97 @@
 #include <atomic>
 #include <unordered_map>
 #include <memory>
+#include <deque>
+#include <algorithm>
+#include <filesystem>
+
+namespace {
+
+// Number of released images that are kept decoded in memory. Reloading one of
+// them (e.g. when an image load is undone and redone) reuses the existing data
+// instead of going back to disk.
+constexpr std::size_t kMaxReleasedImages = 2;
+
+std::filesystem::file_time_type get_modification_time(const std::string& filepath) {
+    std::error_code ec;
+    auto mtime = std::filesystem::last_write_time(filepath, ec);
+    return ec ? std::filesystem::file_time_type::min() : mtime;
+}
+
+} // namespace
 
 // --- PIMPL (Pointer to Implementation) ---
 // This hides the private members of ImageManager from the public header,
 // reducing compile times and separating interface from implementation.
 class ImageManager::Impl {
 public:
+    struct Entry {
+        std::unique_ptr<LibRaw> processor;
+        std::string filepath;
+        std::filesystem::file_time_type mtime;
+        uint64_t ref_count = 0;
+    };
+
     std::mutex image_manager_mutex;
-    std::unordered_map<uint64_t, std::unique_ptr<LibRaw>> image_manager;
+
+    // LibRaw is linked in its plain (non-"_r") build, which is not thread-safe even
+    // across separate LibRaw instances. All decoding therefore goes through this lock,
+    // e.g. a thumbnail extracted in a worker thread while an image is being loaded.
+    // When both locks are needed, image_manager_mutex is taken first.
+    std::mutex libraw_mutex;
+    std::unordered_map<uint64_t, Entry> image_manager;
     std::atomic<uint64_t> next_image_id{1};
+
+    // Maps a filepath to the id of the most recently loaded image of that file,
+    // so that loading the same file again shares the decoded data.
+    std::unordered_map<std::string, uint64_t> ids_by_filepath;
+
+    // Released images that are still kept alive, least recently released first.
+    std::deque<uint64_t> released_ids;
+
+    // The following methods must be called with image_manager_mutex held.
+
+    // Returns the id of an already loaded, unchanged image of the file and
+    // increases its reference count, or returns 0 if there is none.
+    uint64_t acquire_existing(const std::string& filepath, std::filesystem::file_time_type mtime) {
+        auto id_it = ids_by_filepath.find(filepath);
+        if (id_it == ids_by_filepath.end()) {
+            return 0;
+        }
+        uint64_t id = id_it->second;
+        auto it = image_manager.find(id);
+        if (it == image_manager.end() || it->second.mtime != mtime) {
+            return 0;  // The file has changed on disk, it must be loaded again.
+        }
+
+        Entry& entry = it->second;
+        if (entry.ref_count == 0) {
+            released_ids.erase(std::find(released_ids.begin(), released_ids.end(), id));
+        }
+        ++entry.ref_count;
+        return id;
+    }
+
+    // Returns the processor of a loaded (i.e. not released) image.
+    LibRaw* get_processor(uint64_t id) {
+        auto it = image_manager.find(id);
+        if (it == image_manager.end() || it->second.ref_count == 0) {
+            throw std::runtime_error("Invalid image ID");
+        }
+        return it->second.processor.get();
+    }
+
+    void erase(uint64_t id) {
+        auto it = image_manager.find(id);
+        if (it == image_manager.end()) {
+            return;
+        }
+        auto id_it = ids_by_filepath.find(it->second.filepath);
+        if (id_it != ids_by_filepath.end() && id_it->second == id) {
+            ids_by_filepath.erase(id_it);
+        }
+        image_manager.erase(it);
+    }
 };
 
 // --- ImageManager Methods ---
@@ -31,35 +113,56 @@ std::string ImageManager::get_libraw_version() {
 }
 
 uint64_t ImageManager::load_raw_image(const std::string& filepath) {
-    auto processor = std::make_unique<LibRaw>();
-
-    if (processor->open_file(filepath.c_str()) != LIBRAW_SUCCESS) {
-        throw std::runtime_error("Failed to open file: " + filepath);
+    auto mtime = get_modification_time(filepath);
+    {
+        std::lock_guard<std::mutex> lock(pimpl->image_manager_mutex);
+        if (uint64_t id = pimpl->acquire_existing(filepath, mtime)) {
+            return id;
+        }
     }
-    if (processor->unpack() != LIBRAW_SUCCESS) {
-        throw std::runtime_error("Failed to unpack file: " + filepath);
+
+    auto processor = std::make_unique<LibRaw>();
+    {
+        std::lock_guard<std::mutex> libraw_lock(pimpl->libraw_mutex);
+        if (processor->open_file(filepath.c_str()) != LIBRAW_SUCCESS) {
+            throw std::runtime_error("Failed to open file: " + filepath);
+        }
+        if (processor->unpack() != LIBRAW_SUCCESS) {
+            throw std::runtime_error("Failed to unpack file: " + filepath);
+        }
     }
 
     uint64_t id = pimpl->next_image_id.fetch_add(1);
 
     std::lock_guard<std::mutex> lock(pimpl->image_manager_mutex);
-    pimpl->image_manager[id] = std::move(processor);
+    pimpl->image_manager[id] = Impl::Entry{std::move(processor), filepath, mtime, 1};
+    pimpl->ids_by_filepath[filepath] = id;
 
     return id;
 }
 
 void ImageManager::release_raw_image(uint64_t id) {
     std::lock_guard<std::mutex> lock(pimpl->image_manager_mutex);
-    pimpl->image_manager.erase(id);
+    auto it = pimpl->image_manager.find(id);
+    if (it == pimpl->image_manager.end() || it->second.ref_count == 0) {
+        return;
+    }
+    if (--it->second.ref_count > 0) {
+        return;  // The image is still used elsewhere.
+    }
+
+    // Keep the image around for a while in case it gets loaded again.
+    pimpl->released_ids.push_back(id);
+    while (pimpl->released_ids.size() > kMaxReleasedImages) {
+        pimpl->erase(pimpl->released_ids.front());
+        pimpl->released_ids.pop_front();
+    }
 }
 
 ThumbnailData ImageManager::get_thumbnail(uint64_t id) {
     std::lock_guard<std::mutex> lock(pimpl->image_manager_mutex);
-    auto it = pimpl->image_manager.find(id);
-    if (it == pimpl->image_manager.end()) {
-        throw std::runtime_error("Invalid image ID");
-    }
-    LibRaw* processor = it->second.get();
+    LibRaw* processor = pimpl->get_processor(id);
+    std::lock_guard<std::mutex> libraw_lock(pimpl->libraw_mutex);
 
     if (processor->unpack_thumb() != LIBRAW_SUCCESS) {
         throw std::runtime_error("Failed to unpack thumbnail");
@@ -79,11 +182,7 @@ ThumbnailData ImageManager::get_thumbnail(uint64_t id) {
 
 Metadata ImageManager::get_metadata(uint64_t id) {
     std::lock_guard<std::mutex> lock(pimpl->image_manager_mutex);
-    auto it = pimpl->image_manager.find(id);
-    if (it == pimpl->image_manager.end()) {
-        throw std::runtime_error("Invalid image ID");
-    }
-    LibRaw* processor = it->second.get();
+    LibRaw* processor = pimpl->get_processor(id);
 
     Metadata meta;
     meta.make = std::string(processor->imgdata.idata.make);
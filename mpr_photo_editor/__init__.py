@@ -1,15 +1,16 @@
 import os
 import sys
-from pathlib import Path
 
 # On Windows, with Python 3.8+, we need to explicitly add the directory
 # containing our bundled DLLs to the DLL search path.
 # This is necessary for the OS to find libraw.dll and its dependencies
-# when the rust_backend extension module is imported.
+# when the cpp_backend_python_bindings extension module is imported.
 if sys.platform == "win32":
     # Get the path to the directory containing this __init__.py file.
-    package_dir = Path(__file__).resolve().parent
+    # os.path.abspath is used rather than Path.resolve() because it doesn't
+    # need to walk the file system to resolve symlinks.
+    package_dir = os.path.dirname(os.path.abspath(__file__))
     # Construct the path to the 'lib' subdirectory.
-    lib_dir = package_dir / "lib"
-    if lib_dir.is_dir():
-        os.add_dll_directory(str(lib_dir))
+    lib_dir = os.path.join(package_dir, "lib")
+    if os.path.isdir(lib_dir):
+        os.add_dll_directory(lib_dir)
@@ -1,20 +1,22 @@
+import functools
 
 
 try:
     # Import the C++ backend.
     # This will be a .pyd or .so file built by CMake and copied here.
     from . import cpp_backend_python_bindings  # type: ignore
-
-    # Re-export the functions from the C++ backend
-    get_libraw_version = cpp_backend_python_bindings.get_libraw_version
-    load_raw_image = cpp_backend_python_bindings.load_raw_image
-    release_raw_image = cpp_backend_python_bindings.release_raw_image
-    get_thumbnail = cpp_backend_python_bindings.get_thumbnail
-    get_metadata = cpp_backend_python_bindings.get_metadata
-
 except ImportError as e:
     raise ImportError(
         "Could not import the 'cpp_backend_python_bindings'. Please build the project first "
-        "(e.g., run 'make build-cpp').\n"
+        "(e.g., run 'make setup').\n"
         f"Original error: {e}"
-    )
+    ) from e
+
+# Re-export the functions from the C++ backend. They are bound directly (rather
+# than wrapped in Python functions) so calls don't pay for an extra Python frame.
+# The LibRaw version can't change at runtime, so it is only fetched once.
+get_libraw_version = functools.cache(cpp_backend_python_bindings.get_libraw_version)
+load_raw_image = cpp_backend_python_bindings.load_raw_image
+release_raw_image = cpp_backend_python_bindings.release_raw_image
+get_thumbnail = cpp_backend_python_bindings.get_thumbnail
+get_metadata = cpp_backend_python_bindings.get_metadata
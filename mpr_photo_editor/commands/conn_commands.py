@@ -1,6 +1,6 @@
 from typing import Optional
 
-from mpr_photo_editor.model import Model
+from mpr_photo_editor.model import Model, Connection
 from mpr_photo_editor.commands.command_base import Command
 
 
@@ -9,18 +9,15 @@ class AddConnectionCommand(Command):
 
     def __init__(self, model: Model, from_node: str, from_socket: str, to_node: str, to_socket: str, parent: Optional[Command] = None):
         super().__init__(model, "Add Connection", parent)
-        self.conn_data = {
-            "from_node": from_node, "from_socket": from_socket,
-            "to_node": to_node, "to_socket": to_socket
-        }
+        self.connection = Connection(from_node, from_socket, to_node, to_socket)
 
     def redo(self):
         """Adds the connection to the model."""
-        self.model.add_connection(**self.conn_data)
+        self.model.add_connection(*self.connection)
 
     def undo(self):
         """Removes the connection from the model."""
-        self.model.remove_connection(self.conn_data)
+        self.model.remove_connection(self.connection._asdict())
 
 
 class RemoveConnectionCommand(Command):
@@ -28,12 +25,12 @@ class RemoveConnectionCommand(Command):
 
     def __init__(self, model: Model, conn_data: dict, parent: Optional[Command] = None):
         super().__init__(model, "Remove Connection", parent)
-        self.conn_data = conn_data
+        self.connection = Connection(**conn_data)
 
     def redo(self):
         """Removes the connection from the model."""
-        self.model.remove_connection(self.conn_data)
+        self.model.remove_connection(self.connection._asdict())
 
     def undo(self):
         """Re-adds the connection to the model."""
-        self.model.add_connection(**self.conn_data)
+        self.model.add_connection(*self.connection)
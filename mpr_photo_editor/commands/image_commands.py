@@ -9,7 +9,7 @@ class LoadImageCommand(Command):
     """
     A command to load a raw image file for a node.
 
-    This command manages the lifecycle of the image in the Rust backend,
+    This command manages the lifecycle of the image in the C++ backend,
     ensuring that resources are loaded and released correctly during
     redo and undo operations.
     """
@@ -27,16 +27,14 @@ class LoadImageCommand(Command):
         self.new_raw_image_id: Optional[int] = None
 
         # Store the state before the command is executed for undo
-        node_settings = self.model.nodes[self.node_id]["settings"]
+        node_settings = self.model.nodes[self.node_id].settings
         self.old_filepath: Optional[str] = node_settings.get("filepath")
         self.old_raw_image_id: Optional[int] = node_settings.get("raw_image_id")
 
     def redo(self):
         """Releases the old image and updates the model with the new one."""
         if self.old_raw_image_id is not None:
-            backend.release_raw_image(self.old_raw_image_id)
-            if self.old_raw_image_id in self.model.thumbnail_cache:
-                del self.model.thumbnail_cache[self.old_raw_image_id]
+            self.model.release_raw_image(self.node_id, self.old_raw_image_id)
 
         # If this is the first run, use the pre-loaded ID from the controller.
         if self._initial_raw_image_id is not None:
@@ -52,15 +50,13 @@ class LoadImageCommand(Command):
                 self.new_raw_image_id = None
                 # The command is now in a failed state.
 
-        self.model.update_node_setting(self.node_id, "filepath", self.new_filepath)
-        self.model.update_node_setting(self.node_id, "raw_image_id", self.new_raw_image_id)
+        self.model.update_node_settings(
+            self.node_id, {"filepath": self.new_filepath, "raw_image_id": self.new_raw_image_id})
 
     def undo(self):
         """Releases the new image, reloads the old one, and restores the model."""
         if self.new_raw_image_id is not None:
-            backend.release_raw_image(self.new_raw_image_id)
-            if self.new_raw_image_id in self.model.thumbnail_cache:
-                del self.model.thumbnail_cache[self.new_raw_image_id]
+            self.model.release_raw_image(self.node_id, self.new_raw_image_id)
             self.new_raw_image_id = None  # The ID is now invalid
 
         # If there was an old file, we must reload it to get a new, valid handle.
@@ -74,5 +70,5 @@ class LoadImageCommand(Command):
         else:
             self.old_raw_image_id = None
 
-        self.model.update_node_setting(self.node_id, "filepath", self.old_filepath)
-        self.model.update_node_setting(self.node_id, "raw_image_id", self.old_raw_image_id)
+        self.model.update_node_settings(
+            self.node_id, {"filepath": self.old_filepath, "raw_image_id": self.old_raw_image_id})
@@ -1,8 +1,9 @@
 from typing import Optional
 from PySide6.QtCore import QPointF
 
-from mpr_photo_editor.model import Model
+from mpr_photo_editor.model import Model, NodeRecord
 from mpr_photo_editor.commands.command_base import Command
+from mpr_photo_editor import backend
 
 
 class AddNodeCommand(Command):
@@ -21,11 +22,7 @@ class AddNodeCommand(Command):
             self.node_id = self.model.add_node(self.node_type, self.position)
         else:
             # Subsequent redos: re-add the node with its original ID and data
-            node_data = {
-                "type": self.node_type,
-                "position": (self.position.x(), self.position.y()),
-                "settings": {}
-            }
+            node_data = NodeRecord(self.node_type, (self.position.x(), self.position.y()))
             self.model._add_node_with_data(self.node_id, node_data)
 
     def undo(self):
@@ -40,17 +37,33 @@ class RemoveNodeCommand(Command):
     def __init__(self, model: Model, node_id: str, parent: Optional[Command] = None):
         super().__init__(model, "Remove Node", parent)
         self.node_id = node_id
-        # Store all data required to recreate the node
-        self.node_data = model.nodes[self.node_id].copy()
-        self.connections_data = [c.copy() for c in model.connections if c["from_node"] == node_id or c["to_node"] == node_id]
+        # The data required to recreate the node is captured in redo(), right
+        # before the node is removed, so creating the command copies nothing.
+        self.node_data: Optional[NodeRecord] = None
+        self.connections_data: list[dict] = []
 
     def redo(self):
         """Removes the node from the model."""
+        # Keep references instead of copies: once removed from the model, nothing
+        # else modifies this data until undo() hands it back.
+        self.node_data = self.model.nodes[self.node_id]
+        self.connections_data = self.model.get_node_connections(self.node_id)
         self.model.remove_node(self.node_id)
+        # remove_node released the node's image handle. Backend handles are shared and
+        # reused per file, so the released ID must not go back into the model on undo.
+        if "raw_image_id" in self.node_data.settings:
+            self.node_data.settings["raw_image_id"] = None
 
     def undo(self):
         """Re-adds the node and its connections to the model."""
+        settings = self.node_data.settings
+        if self.node_data.type == "ImageLoader" and settings.get("filepath"):
+            # The image was released with the node, load it again to get a valid handle.
+            try:
+                settings["raw_image_id"] = backend.load_raw_image(settings["filepath"])
+            except Exception as e:
+                print(f"Failed to reload image '{settings['filepath']}' during undo: {e}")
+                settings["raw_image_id"] = None
         self.model._add_node_with_data(self.node_id, self.node_data)
-        for conn_data in self.connections_data:
-            self.model.add_connection(**conn_data)
+        self.model.add_connections(self.connections_data)
 
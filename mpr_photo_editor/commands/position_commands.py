@@ -20,4 +20,4 @@ class MoveNodeCommand(Command):
 
     def undo(self):
         """Moves the node back to the start position."""
-        self.model.update_node_position(self.node_id, self.start_pos)
\ No newline at end of file
+        self.model.update_node_position(self.node_id, self.start_pos)
@@ -13,7 +13,7 @@ class ChangeSettingCommand(Command):
         self.key = key
         self.new_value = new_value
         # Store the old value for undo
-        self.old_value = model.nodes[node_id]["settings"].get(key)
+        self.old_value = model.get_setting(node_id, key)
 
     def redo(self):
         """Applies the new setting value to the model."""
@@ -44,11 +44,12 @@ class Controller(QObject):
             print(f"Error: Controller could not find node {node_id} in model.")
             return
 
-        node_type = node_data.get("type")
-        if node_type == "ImageLoader" and key == "filepath":
+        if node_data.type == "ImageLoader" and key == "filepath":
             # This is a special case for the ImageLoader node. We must validate that the image can be loaded *before* creating a command. If it fails, no action is taken.
             try:
                 new_raw_image_id = backend.load_raw_image(value)
+                # The panels will want the thumbnail next, start extracting it right away.
+                self.model.prefetch_thumbnail(new_raw_image_id, value)
                 # If loading succeeds, create the specialized command.
                 load_command = image_commands.LoadImageCommand(self.model, node_id, value, new_raw_image_id)
                 self.undo_stack.push(load_command)
@@ -80,13 +81,19 @@ class Controller(QObject):
         print(f"Controller: Saving project to {filepath}")
         data = self.model.to_dict()
         data['ui_state'] = {'selected_node_id': selected_node_id}
-        with open(filepath, 'wb' if binary else 'w') as f:
-            json.dump(data, f, indent=None if binary else 4)
+        if binary:
+            # Without indentation, json uses its C encoder and we can write the
+            # whole (compact) document in one go.
+            with open(filepath, 'wb') as f:
+                f.write(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        else:
+            with open(filepath, 'w') as f:
+                json.dump(data, f, indent=4)
 
     def load_project(self, filepath: str, binary: bool = False) -> Optional[dict]:
         """Loads an .mpr file, rebuilds the model, and returns UI state."""
         with open(filepath, 'rb' if binary else 'r') as f:
-            data = json.load(f)
+            data = json.loads(f.read())
 
         ui_state = data.get('ui_state')
         self.model.from_dict(data)
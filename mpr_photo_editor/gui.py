@@ -1,25 +1,24 @@
 import sys
 import os
+from collections import OrderedDict
 from typing import Optional
 
 from PySide6.QtGui import (
-    QResizeEvent, QShowEvent, QPainter, QPixmap,
-    QMouseEvent, QKeySequence, QColor, QGuiApplication, QAction
+    QResizeEvent, QShowEvent, QPaintEvent, QPainter, QImage,
+    QMouseEvent, QKeySequence, QColor, QCursor, QGuiApplication, QAction, QPixmapCache
 )
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel,
-    QHBoxLayout, QVBoxLayout, QFrame, QSplitter,
-    QFileDialog, QMenuBar
+    QVBoxLayout, QFrame, QSplitter,
+    QFileDialog, QMenuBar, QStackedWidget, QMessageBox
 )
 
-from PySide6.QtCore import Qt
-
-from PySide6.QtWidgets import QGraphicsScene, QGraphicsView, QGraphicsRectItem
+from PySide6.QtCore import Qt, QPoint, QRect
 from PySide6.QtCore import QTimer
 
 import mpr_photo_editor.nodes as nodes
 import mpr_photo_editor.helper as helper
-from mpr_photo_editor.node_panels import DefaultPanel, get_node_panel
+from mpr_photo_editor.node_panels import DefaultPanel, get_node_panel, PIXMAP_CACHE_LIMIT_KB
 from mpr_photo_editor.model import Model
 from mpr_photo_editor.controller import Controller
 from mpr_photo_editor.backend import get_libraw_version
@@ -29,24 +28,61 @@ DEFAULT_HEIGHT = 600
 DEFAULT_SIDEBAR_WIDTH = 250
 DEFAULT_NODEBAR_HEIGHT = 200
 
-image_data = [128] * (100 * 100)  # Dummy grayscale image
+# Minimum interval between two geometry updates while dragging/resizing an image (~60 fps)
+DRAG_UPDATE_INTERVAL_MS = 16
+
+# Maximum number of node settings panels kept alive for quick reselection
+MAX_CACHED_PANELS = 16
 
 class DraggableImage(QLabel):
+    # The gray placeholder every image starts with. QImage is implicitly shared, so all
+    # instances use the same pixel buffer until one of them is written to.
+    _placeholder_image: Optional[QImage] = None
+
+    # QCursor objects by shape, created on first use and reused afterwards
+    _cursors: dict[Qt.CursorShape, QCursor] = {}
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        # Set a default pixmap and store aspect ratio
-        pixmap = QPixmap(150, 100)  # Example default rectangle
-        pixmap.fill("gray")
-        self.setPixmap(pixmap)
-        self.aspect_ratio = pixmap.width() / pixmap.height()
-        self.setScaledContents(True)
-        self.setFixedSize(pixmap.size())
+        # Set a default image and store aspect ratio. A QImage is a plain CPU-side buffer
+        # that the backend can write into without the pixmap upload to the window system.
+        self._image = self._get_placeholder_image()
+        self.aspect_ratio = self._image.width() / self._image.height()
+        # The image is positioned manually (no layout), so a plain resize is enough and,
+        # unlike setFixedSize, doesn't invalidate the size hints on every resize step.
+        self.setMinimumSize(20, 20)
+        self.resize(self._image.size())
         self.dragging = False
         self.offset = None
-        self.setStyleSheet("border: 1px solid black;")
+        # The border is painted by hand, changing a style sheet on hover re-polishes the widget
+        self._border_color = QColor("black")
         self.resizing = False
         self.resize_margin = 10
-        self.setMouseTracking(True)
+        self._resize_rect = QRect()
+        self._update_resize_rect()
+        self._cursor_shape = Qt.CursorShape.ArrowCursor
+
+        # Moving/resizing the widget triggers a relayout of the parent, so mouse moves
+        # are coalesced and only the latest position is applied once per interval.
+        self._pending_pos: Optional[QPoint] = None
+        self._drag_timer = QTimer(self)
+        self._drag_timer.setSingleShot(True)
+        self._drag_timer.setInterval(DRAG_UPDATE_INTERVAL_MS)
+        self._drag_timer.timeout.connect(self._apply_pending_pos)
+
+    @classmethod
+    def _get_placeholder_image(cls) -> QImage:
+        if cls._placeholder_image is None:
+            cls._placeholder_image = QImage(150, 100, QImage.Format.Format_RGBA8888)  # Example default rectangle
+            cls._placeholder_image.fill(QColor("gray"))
+        return cls._placeholder_image
+
+    def paintEvent(self, event: QPaintEvent):
+        # Scale the image into the widget and draw a 1px border around it
+        painter = QPainter(self)
+        painter.drawImage(self.rect().adjusted(1, 1, -1, -1), self._image)
+        painter.setPen(self._border_color)
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
 
     def mousePressEvent(self, event: QMouseEvent):
         if event.button() == Qt.MouseButton.LeftButton:
@@ -58,45 +94,80 @@ class DraggableImage(QLabel):
 
     def cursorUpdate(self, pos):
         if self._in_resize_area(pos) or self.resizing:
-            self.setCursor(Qt.CursorShape.SizeFDiagCursor)
+            self._set_cursor_shape(Qt.CursorShape.SizeFDiagCursor)
         else:
-            self.setCursor(Qt.CursorShape.ArrowCursor)
+            self._set_cursor_shape(Qt.CursorShape.ArrowCursor)
+
+    def _set_cursor_shape(self, shape: Qt.CursorShape):
+        """Sets the cursor, but only if it changes (this is called on every mouse move)."""
+        if shape != self._cursor_shape:
+            self._cursor_shape = shape
+            cursor = self._cursors.get(shape)
+            if cursor is None:
+                cursor = self._cursors[shape] = QCursor(shape)
+            self.setCursor(cursor)
 
     def mouseMoveEvent(self, event: QMouseEvent):
         self.cursorUpdate(event.pos())
-        if event.buttons() == Qt.MouseButton.LeftButton:
-            if self.resizing:
-                width = max(20, event.pos().x())
-                height = max(20, int(width / self.aspect_ratio))
-                self.setFixedSize(width, height)
-            elif self.dragging and self.offset is not None:
-                new_pos = self.mapToParent(event.pos() - self.offset)
-                self.move(new_pos)
+        if event.buttons() == Qt.MouseButton.LeftButton and (self.resizing or self.dragging):
+            self._pending_pos = event.pos()
+            if not self._drag_timer.isActive():
+                self._drag_timer.start()
+
+    def _apply_pending_pos(self):
+        """Applies the latest mouse position of an ongoing resize or drag."""
+        pos = self._pending_pos
+        self._pending_pos = None
+        if pos is None:
+            return
+        if self.resizing:
+            width = max(20, pos.x())
+            height = max(20, int(width / self.aspect_ratio))
+            self.resize(width, height)
+        elif self.dragging and self.offset is not None:
+            new_pos = self.mapToParent(pos - self.offset)
+            self.move(new_pos)
 
     def mouseReleaseEvent(self, event: QMouseEvent):
+        # Don't lose the last movement that is still waiting for the timer.
+        self._drag_timer.stop()
+        self._apply_pending_pos()
         self.dragging = False
         self.resizing = False
         self.offset = None
 
     def enterEvent(self, event):
-        self.setStyleSheet("border: 1px solid blue;")
+        # Hover moves are only needed for the resize cursor, so only track them while
+        # the mouse is over the image (drags are delivered via the implicit mouse grab).
+        self.setMouseTracking(True)
+        self._border_color = QColor("blue")
+        self.update()
 
     def leaveEvent(self, event):
-        self.setStyleSheet("border: 1px solid black;")
-        self.setCursor(Qt.CursorShape.ArrowCursor)
+        self.setMouseTracking(False)
+        self._border_color = QColor("black")
+        self.update()
+        self._set_cursor_shape(Qt.CursorShape.ArrowCursor)
+
+    def resizeEvent(self, event: QResizeEvent):
+        super().resizeEvent(event)
+        self._update_resize_rect()
+
+    def _update_resize_rect(self):
+        """Caches the bottom-right resize handle, which is hit-tested on every mouse move."""
+        width, height = self.width(), self.height()
+        # The bounds are inclusive on both ends, hence the + 1
+        self._resize_rect = QRect(width - self.resize_margin, height - self.resize_margin,
+                                  self.resize_margin + 1, self.resize_margin + 1)
 
     def _in_resize_area(self, pos):
-        return (
-            self.width() - self.resize_margin <= pos.x() <= self.width() and
-            self.height() - self.resize_margin <= pos.y() <= self.height()
-        )
+        return self._resize_rect.contains(pos)
 
 class ImageCanvas(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setMinimumSize(400, 400)
         self.setStyleSheet("background-color: white;")
-        self.setMouseTracking(True)
 
     def add_image(self):
         img = DraggableImage(self)
@@ -108,6 +179,8 @@ class FixedRightSplitter(QSplitter):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.right_width = DEFAULT_SIDEBAR_WIDTH
+        self._resize_pending = False
+        self._last_resize: Optional[tuple[int, int]] = None
         self.splitterMoved.connect(self.on_splitter_moved)
 
     def on_splitter_moved(self, pos, index):
@@ -115,11 +188,28 @@ class FixedRightSplitter(QSplitter):
 
     def _resize(self):
         total = self.width()
+        # Show and resize events often arrive without the width having changed, in which
+        # case the (relayouting) setSizes call can be skipped.
+        if (total, self.right_width) == self._last_resize:
+            return
+        self._last_resize = (total, self.right_width)
         right = min(self.right_width, total - 10)
         self.setSizes([total - right, right])
 
-    def resizeEvent(self, event):
+    def _schedule_resize(self):
+        # setSizes relayouts all children, so we only apply the last of the resize
+        # events that arrive within one event loop iteration (e.g. while the window
+        # is being resized).
+        if not self._resize_pending:
+            self._resize_pending = True
+            QTimer.singleShot(0, self._apply_pending_resize)
+
+    def _apply_pending_resize(self):
+        self._resize_pending = False
         self._resize()
+
+    def resizeEvent(self, event):
+        self._schedule_resize()
         super().resizeEvent(event)
 
     def showEvent(self, event):
@@ -130,6 +220,8 @@ class FixedBottomSplitter(QSplitter):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.bottom_height = DEFAULT_NODEBAR_HEIGHT
+        self._resize_pending = False
+        self._last_resize: Optional[tuple[int, int]] = None
         self.splitterMoved.connect(self.on_splitter_moved)
 
     def on_splitter_moved(self, pos, index):
@@ -137,11 +229,25 @@ class FixedBottomSplitter(QSplitter):
 
     def _resize(self):
         total = self.height()
+        # See FixedRightSplitter._resize
+        if (total, self.bottom_height) == self._last_resize:
+            return
+        self._last_resize = (total, self.bottom_height)
         bottom = min(self.bottom_height, total - 10)
         self.setSizes([total - bottom, bottom])
 
-    def resizeEvent(self, event: QResizeEvent) -> None:
+    def _schedule_resize(self):
+        # See FixedRightSplitter._schedule_resize.
+        if not self._resize_pending:
+            self._resize_pending = True
+            QTimer.singleShot(0, self._apply_pending_resize)
+
+    def _apply_pending_resize(self):
+        self._resize_pending = False
         self._resize()
+
+    def resizeEvent(self, event: QResizeEvent) -> None:
+        self._schedule_resize()
         return super().resizeEvent(event)
     
     def showEvent(self, event: QShowEvent) -> None:
@@ -161,50 +267,12 @@ class MainWindow(QWidget):
         self.selected_node_id: Optional[str] = None
 
         # Cache for node settings panels to avoid recreating them
-        self.panel_cache: dict[str, QWidget] = {}
+        # (least recently shown first, see MAX_CACHED_PANELS)
+        self.panel_cache: OrderedDict[str, QWidget] = OrderedDict()
         self.current_panel: Optional[QWidget] = None
 
         self.init_ui()
 
-    def init_ui_(self):
-        main_layout = QHBoxLayout(self)
-
-        scene = QGraphicsScene()
-        scene.setObjectName('The scene')
-        scene.setSceneRect(-50, -50, 1300, 1300)
-
-        rect = QGraphicsRectItem(10, 10, 700, 600)
-        rect.setBrush(QColor("blue"))
-        rect.setPen(Qt.PenStyle.NoPen)
-        scene.addItem(rect)
-
-        # pen = QPen(Qt.GlobalColor.yellow)
-        # brush = QBrush(Qt.GlobalColor.red)
-        # scene.addRect(10, 10, 700, 600, pen, brush)
-
-        def zoom_to_content():
-            print("View size:", view.viewport().size())
-            print("Scene rect:", scene.sceneRect())
-            print("Scene items bounding rect:", scene.itemsBoundingRect())
-            view.fitInView(scene.itemsBoundingRect(), Qt.AspectRatioMode.KeepAspectRatio)
-            view.centerOn(scene.itemsBoundingRect().center())
-
-        QTimer.singleShot(0, zoom_to_content)
-        
-        view = QGraphicsView(scene)
-        view.setStyleSheet("border: 2px solid red;")
-        view.resetTransform()
-        view.setRenderHints(QPainter.RenderHint.Antialiasing | QPainter.RenderHint.SmoothPixmapTransform)
-
-        main_layout.addWidget(view)
-        QTimer.singleShot(0, lambda: view.fitInView(scene.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio))
-        # view.fitInView(scene.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
-        # view.centerOn(500, 500)
-
-        print("Scene has items:", scene.items())
-        self.scene = scene
-        # self.view = view
-
     def _create_menu_bar(self) -> QMenuBar:
         """Creates and configures the main menu bar."""
         menu_bar = QMenuBar()
@@ -244,6 +312,13 @@ class MainWindow(QWidget):
         edit_menu.addAction(undo_action)
         edit_menu.addAction(redo_action)
 
+        # View Menu
+        view_menu = menu_bar.addMenu("&View")
+
+        antialiasing_action = view_menu.addAction("&Antialiasing")
+        antialiasing_action.setCheckable(True)
+        antialiasing_action.toggled.connect(self.set_node_antialiasing)
+
         return menu_bar
 
     def init_ui(self):
@@ -275,11 +350,16 @@ class MainWindow(QWidget):
         right_panel.setFrameShape(QFrame.Shape.StyledPanel)
         right_layout = QVBoxLayout(right_panel)
 
+        # The default panel and the (cached) node panels are pages of a stacked widget,
+        # so switching between them doesn't require relayouting the right panel.
+        self.panel_stack = QStackedWidget(right_panel)
+        right_layout.addWidget(self.panel_stack)
+
         # Create a container for the default widgets that are shown when no node is selected
-        self.default_panel_widget = DefaultPanel(parent=right_panel)
+        self.default_panel_widget = DefaultPanel(parent=self.panel_stack)
         self.default_panel_widget.load_image_clicked.connect(self.load_image)
         self.default_panel_widget.get_version_clicked.connect(self.show_libraw_version)
-        right_layout.addWidget(self.default_panel_widget)
+        self.panel_stack.addWidget(self.default_panel_widget)
         horizontal_splitter.addWidget(left_panel)
         horizontal_splitter.addWidget(right_panel)
 
@@ -296,8 +376,9 @@ class MainWindow(QWidget):
         self.node_scene = node_scene = nodes.NodeScene(self.controller, self.model)
         node_scene.node_selected.connect(self.update_right_panel)
         self.model.node_removed.connect(self.on_node_removed_from_model)
+        self.model.model_cleared.connect(self.on_model_cleared)
 
-        node_view = nodes.NodeView(node_scene)
+        self.node_view = node_view = nodes.NodeView(node_scene)
         node_view.setStyleSheet("border: none;")
         bottom_layout.addWidget(node_view)
 
@@ -327,12 +408,17 @@ class MainWindow(QWidget):
 
         main_layout.addWidget(vertical_splitter)
 
+    def set_node_antialiasing(self, enabled: bool):
+        """Turns antialiasing of the node graph on or off."""
+        self.node_view.setRenderHint(QPainter.RenderHint.Antialiasing, enabled)
+
     def load_image(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             "Open RAW Image",
             "",
-            "RAW Images (*.cr2 *.nef *.arw *.dng *.rw2 *.orf *.raf *.srw *.pef);;All Files (*)"
+            helper.RAW_IMAGE_FILTER,
+            options=QFileDialog.Option.DontUseCustomDirectoryIcons
         )
         if file_path:
             self.image_container.add_image()
@@ -351,7 +437,8 @@ class MainWindow(QWidget):
             self,
             "Save Project",
             default_path,
-            "MPR Project Files (*.mpr);;All Files (*)"
+            "MPR Project Files (*.mpr);;All Files (*)",
+            options=QFileDialog.Option.DontUseCustomDirectoryIcons
         )
         if filepath:
             self.current_filepath = filepath
@@ -362,11 +449,18 @@ class MainWindow(QWidget):
         """Open the project from a .mpr file."""
         default_path = self.current_filepath or os.path.expanduser("~/untitled.mpr")
         filepath, _ = QFileDialog.getOpenFileName(
-            self, "Open Project", default_path, "MPR Project Files (*.mpr);;All Files (*)"
+            self, "Open Project", default_path, "MPR Project Files (*.mpr);;All Files (*)",
+            options=QFileDialog.Option.DontUseCustomDirectoryIcons
         )
         if filepath:
+            try:
+                ui_state = self.controller.load_project(filepath)
+            except (OSError, ValueError, TypeError) as e:
+                # The model is only changed once the whole project has been read,
+                # so the current graph is still intact.
+                QMessageBox.warning(self, "Open Project", f"Could not open '{filepath}':\n{e}")
+                return
             self.current_filepath = filepath
-            ui_state = self.controller.load_project(filepath)
             self.setWindowTitle(f"Photo Editor - {os.path.basename(filepath)}")
 
             if ui_state:
@@ -385,36 +479,50 @@ class MainWindow(QWidget):
             panel_to_remove = self.panel_cache.pop(node_id)
             if self.current_panel == panel_to_remove:
                 self.current_panel = None
+            self.panel_stack.removeWidget(panel_to_remove)
             panel_to_remove.deleteLater()
 
+    def on_model_cleared(self):
+        """Drops all cached panels when the whole model has been cleared."""
+        for panel in self.panel_cache.values():
+            self.panel_stack.removeWidget(panel)
+            panel.deleteLater()
+        self.panel_cache.clear()
+        self.selected_node_id = None
+        self.current_panel = None
+        self.panel_stack.setCurrentWidget(self.default_panel_widget)
+
     def update_right_panel(self, node):
-        # 1. Hide the currently visible node-specific panel
-        if self.current_panel:
-            self.current_panel.hide()
-            self.current_panel = None
+        # node_selected can fire repeatedly for the same node, nothing to do then
+        new_node_id = node.node_id if node else None
+        if new_node_id == self.selected_node_id and (
+                new_node_id is None or self.current_panel is self.panel_cache.get(new_node_id)):
+            return
 
-        # 2. Decide which panel to show
         if node and node.node_id:
-            # A node is selected, so hide the default panel and show the node's panel
-            self.selected_node_id = node.node_id
-            self.default_panel_widget.hide()
-            node_id = node.node_id
-
-            if node_id in self.panel_cache:
-                panel = self.panel_cache[node_id]
+            # A node is selected, so show the node's panel (creating it on first use)
+            self.selected_node_id = node_id = node.node_id
+
+            panel = self.panel_cache.get(node_id)
+            if panel is None:
+                panel = get_node_panel(node_id, self.model, self.controller, parent=self.panel_stack)
+                self.panel_stack.addWidget(panel)
+                self.panel_cache[node_id] = panel
+                if len(self.panel_cache) > MAX_CACHED_PANELS:
+                    # Evict the least recently shown panel, it is rebuilt when needed again
+                    _, evicted_panel = self.panel_cache.popitem(last=False)
+                    self.panel_stack.removeWidget(evicted_panel)
+                    evicted_panel.deleteLater()
             else:
-                panel = get_node_panel(node_id, self.model, self.controller, parent=self.right_panel)
-                layout = self.right_panel.layout()
-                if layout:
-                    layout.addWidget(panel)
-                    self.panel_cache[node_id] = panel
+                self.panel_cache.move_to_end(node_id)
 
-            panel.show()
+            self.panel_stack.setCurrentWidget(panel)
             self.current_panel = panel
         else:
             # No node is selected, so show the default panel
             self.selected_node_id = None
-            self.default_panel_widget.show()
+            self.current_panel = None
+            self.panel_stack.setCurrentWidget(self.default_panel_widget)
 
     def show_libraw_version(self):
         """Gets the LibRaw version and displays it in the label."""
@@ -425,6 +533,7 @@ class MainWindow(QWidget):
 def main():
     app = QApplication(sys.argv)
     helper._DPIHelper.initialize(app)
+    QPixmapCache.setCacheLimit(PIXMAP_CACHE_LIMIT_KB)
 
     window = MainWindow()
     window.showMaximized()
@@ -3,6 +3,9 @@ from PySide6.QtGui import QScreen
 from PySide6.QtWidgets import QGraphicsRectItem
 from PySide6.QtGui import QColor
 
+# The name filter of the file dialogs that select raw images
+RAW_IMAGE_FILTER = "Raw Images (*.cr2 *.nef *.arw *.dng *.rw2 *.orf *.raf *.srw *.pef);;All Files (*)"
+
 
 class _DPIHelper:
     _scale = 1.0
@@ -24,11 +27,14 @@ class _DPIHelper:
 
 
 # Public API
+# These read the scale directly rather than calling the classmethods. The scale isn't
+# captured once, since modules import dp by name before initialize() runs.
 def dp(value: float) -> float:
-    return _DPIHelper.dp(value)
+    """Convert a value in logical pixels to scaled device pixels."""
+    return value * _DPIHelper._scale
 
 def scale() -> float:
-    return _DPIHelper.scale()
+    return _DPIHelper._scale
 
 
 
@@ -1,8 +1,77 @@
-import uuid
-from PySide6.QtCore import QObject, Signal, QPointF
+import os
+import sys
+import itertools
+import secrets
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, QPointF
 
 from mpr_photo_editor import backend
 
+# The maximum number of thumbnails kept in the file-based thumbnail cache.
+FILE_THUMBNAIL_CACHE_SIZE = 32
+
+
+class Connection(NamedTuple):
+    """A compact, immutable description of a connection between two node sockets."""
+    from_node: str
+    from_socket: str
+    to_node: str
+    to_socket: str
+
+    @classmethod
+    def from_dict(cls, connection_data: dict) -> "Connection":
+        """Returns the hashable key of a connection given as a dict."""
+        return cls(connection_data["from_node"], connection_data["from_socket"],
+                   connection_data["to_node"], connection_data["to_socket"])
+
+
+@dataclass(slots=True)
+class NodeRecord:
+    """The state of a single node. Uses slots rather than a dict to keep large graphs small."""
+    type: str
+    position: tuple[float, float]
+    settings: dict = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        """Returns the node in the format it is saved in."""
+        return {"type": self.type, "position": self.position, "settings": self.settings}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "NodeRecord":
+        """Creates a node from the format it is saved in. Raises ValueError for malformed nodes."""
+        if not isinstance(data, dict):
+            raise ValueError(f"Node is not a dict: {data!r}")
+        node_type = data.get("type")
+        if not isinstance(node_type, str):
+            raise ValueError(f"Node has no valid type: {node_type!r}")
+        settings = data.get("settings") or {}
+        if not isinstance(settings, dict):
+            raise ValueError(f"Node settings are not a dict: {settings!r}")
+        x, y = data.get("position", (0.0, 0.0))
+        return cls(sys.intern(node_type), (float(x), float(y)), settings)
+
+
+class _ThumbnailLoader(QRunnable):
+    """Extracts the thumbnail of a loaded image in a worker thread."""
+
+    def __init__(self, model: "Model", raw_image_id: int):
+        super().__init__()
+        self.model = model
+        self.raw_image_id = raw_image_id
+
+    def run(self):
+        # The backend releases the GIL while extracting, so the GUI stays responsive.
+        try:
+            thumb_data = backend.get_thumbnail(self.raw_image_id)
+        except Exception as e:
+            print(f"Error getting thumbnail: {e}")
+            thumb_data = None
+        # The signal is delivered in the model's (i.e. the GUI) thread.
+        self.model.thumbnail_loaded.emit(self.raw_image_id, thumb_data)
+
 
 class Model(QObject):
     """
@@ -18,12 +87,23 @@ class Model(QObject):
     node_added = Signal(str)  # node_id
     node_removed = Signal(str)  # node_id
     node_setting_changed = Signal(str, str, object)  # node_id, key, value
+    node_settings_changed = Signal(str, dict)  # node_id, {key: value}
     node_position_changed = Signal(str, QPointF)  # node_id, position
 
     # Signals for connection changes
     connection_added = Signal(dict)  # connection_data
     connection_removed = Signal(dict)  # connection_data
 
+    # Emitted once after from_dict populated the model, instead of one
+    # node_added/connection_added signal per loaded node and connection.
+    graph_loaded = Signal()
+    # Emitted once by clear(), instead of one node_removed/connection_removed
+    # signal per node and connection.
+    model_cleared = Signal()
+
+    # Emitted when a thumbnail requested with prefetch_thumbnail is available
+    thumbnail_loaded = Signal(object, object)  # raw_image_id, thumbnail_data (None on error)
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
@@ -33,11 +113,22 @@ class Model(QObject):
 
         # The "source of truth" for the graph structure and settings.
         # This is what gets serialized when saving the project.
-        # { node_id: { "type": "...", "position": (x, y), "settings": {...} } }
-        self.nodes = {}
+        # { node_id: NodeRecord }
+        self.nodes: dict[str, NodeRecord] = {}
+
+        # New node IDs are a random per-session prefix plus a counter. They are unique
+        # within the session by construction and unlikely to clash with loaded projects.
+        self._id_prefix = secrets.token_hex(4)
+        self._id_counter = itertools.count()
 
-        # [ {"from_node": ..., "from_socket": ..., "to_node": ..., "to_socket": ...} ]
-        self.connections = []
+        # Keyed by Connection for O(1) membership tests, in insertion order for saving.
+        # { Connection: {"from_node": ..., "from_socket": ..., "to_node": ..., "to_socket": ...} }
+        self.connections: dict[Connection, dict] = {}
+
+        # An index of the connections attached to each node, so that we don't have
+        # to scan all connections to find the ones of a single node.
+        # { node_id: [connection_data, ...] }
+        self._connections_by_node: dict[str, list[dict]] = {}
 
         # A cache for large, non-serializable data from the backend (e.g., image handles).
         # This is never saved to the project file. It is rebuilt on load or can be
@@ -49,67 +140,249 @@ class Model(QObject):
         # as some backend operations may be one-shot.
         self.thumbnail_cache = {}
 
+        # The metadata of loaded images, so that selecting a node again doesn't ask
+        # the backend again. { raw_image_id: {key: value} }
+        self.metadata_cache = {}
+
+        # A second thumbnail cache keyed by file (path and modification time) rather
+        # than by image handle. It survives images being released and loaded again
+        # (e.g. on undo/redo or when reopening a project), so it is not cleared with
+        # the model. It evicts the least recently used thumbnails.
+        # { (filepath, mtime): thumbnail_data }
+        self.file_thumbnail_cache: OrderedDict[tuple[str, float], object] = OrderedDict()
+
+        # Thumbnails that are currently being extracted in the background.
+        # { raw_image_id: file_key }
+        self._pending_thumbnails: dict[int, Optional[tuple[str, float]]] = {}
+        self.thumbnail_loaded.connect(self._on_thumbnail_loaded)
+
     def to_dict(self):
         """
         Convert graph information to dictionary for easy saving.
         """
         return dict(
             version = self.version,
-            nodes = self.nodes,
-            connections = self.connections
+            nodes = {node_id: node.to_dict() for node_id, node in self.nodes.items()},
+            connections = list(self.connections.values())
         )
 
     def clear(self):
         """Clears the entire model, releasing any associated backend resources."""
         # Release backend resources for all image loader nodes
-        for node_data in self.nodes.values():
-            if node_data.get("type") == "ImageLoader":
-                raw_image_id = node_data.get("settings", {}).get("raw_image_id")
-                if raw_image_id is not None:
-                    backend.release_raw_image(raw_image_id)
-
-        # Emit signals to remove all UI elements before clearing the data.
-        # Iterate over copies as the lists will be modified by remove signals.
-        for conn_data in list(self.connections):
-            self.connection_removed.emit(conn_data)
-
-        for node_id in list(self.nodes.keys()):
-            self.node_removed.emit(node_id)
+        for node in self.nodes.values():
+            raw_image_id = self._get_raw_image_id(node)
+            if raw_image_id is not None:
+                backend.release_raw_image(raw_image_id)
 
         # Clear the internal data structures
         self.nodes = {}
-        self.connections = []
+        self.connections = {}
+        self._connections_by_node = {}
         self.runtime_cache = {}
         self.thumbnail_cache = {}
+        self.metadata_cache = {}
+        self._pending_thumbnails = {}
+
+        # Let the UI tear down all of its elements at once
+        self.model_cleared.emit()
 
     def from_dict(self, data: dict):
         """Populates the model from a dictionary, rebuilding the graph."""
+        # Read the whole graph before touching the model, so that a broken project
+        # leaves the current graph (and its image handles) as they are.
+        if not isinstance(data, dict) or not isinstance(data.get('nodes', {}), dict):
+            raise ValueError("Project is not a dict with a dict of nodes")
+        # Node IDs are interned, so that the connections read below share their strings.
+        nodes = {sys.intern(node_id): NodeRecord.from_dict(node_data)
+                 for node_id, node_data in data.get('nodes', {}).items()}
+        connection_keys = self._read_connections(data.get('connections', []), nodes)
+
         self.clear()  # Start with a clean slate, releasing old resources.
 
         self.version = data.get('version', self.version)
-        nodes_data = data.get('nodes', {})
 
         # Re-acquire backend resources for image loaders before adding to model
-        for node_id, node_data in nodes_data.items():
-            if node_data.get("type") == "ImageLoader" and node_data.get("settings", {}).get("filepath"):
-                filepath = node_data["settings"]["filepath"]
-                try:
-                    node_data["settings"]["raw_image_id"] = backend.load_raw_image(filepath)
-                except Exception as e:
+        # { filepath: [(node_id, settings), ...] }
+        loaders_by_filepath: dict[str, list[tuple[str, dict]]] = {}
+        for node_id, node in nodes.items():
+            if node.type != "ImageLoader":
+                continue
+            filepath = node.settings.get("filepath")
+            if filepath:
+                loaders_by_filepath.setdefault(filepath, []).append((node_id, node.settings))
+
+        # Images are loaded one after the other, as LibRaw isn't thread-safe. Nodes sharing
+        # a file let the backend decode it once and hand out the same (reference counted) image.
+        for filepath, loaders in loaders_by_filepath.items():
+            try:
+                raw_image_ids = self._load_raw_images(filepath, len(loaders))
+            except Exception as e:
+                for node_id, settings in loaders:
                     print(f"Failed to reload image '{filepath}' for node {node_id}: {e}")
-                    node_data["settings"]["raw_image_id"] = None
+                    settings["raw_image_id"] = None
+                continue
+            for (node_id, settings), raw_image_id in zip(loaders, raw_image_ids):
+                settings["raw_image_id"] = raw_image_id
+            self.prefetch_thumbnail(raw_image_ids[0], filepath)
 
-        self.nodes = nodes_data
-        self.connections = data.get('connections', [])
+        self.nodes = nodes
+        self._store_connections(connection_keys)
 
-        # Now that data is loaded, emit signals to build the UI
-        for node_id in self.nodes.keys():
-            self.node_added.emit(node_id)
+        # Now that data is loaded, let the UI build itself in one go
+        self.graph_loaded.emit()
 
-        for connection_data in self.connections:
-            self.connection_added.emit(connection_data)
+    @classmethod
+    def _read_connections(cls, connections_data: list[dict], node_ids) -> list[Connection]:
+        """
+        Returns the keys of the loaded connections that can be added to the given nodes.
+        Malformed, dangling and duplicate connections are skipped with a warning.
+        """
+        keys: dict[Connection, None] = {}
+        for connection_data in connections_data:
+            try:
+                key = cls._connection_key(connection_data)
+            except (KeyError, TypeError) as e:
+                print(f"Skipping malformed connection {connection_data!r}: {e}")
+                continue
+            if key.from_node not in node_ids or key.to_node not in node_ids:
+                print(f"Skipping connection with a non-existent node. "
+                      f"From: {key.from_node}, To: {key.to_node}")
+            elif key in keys:
+                print(f"Skipping duplicate connection {connection_data!r}")
+            else:
+                keys[key] = None
+        return list(keys)
+
+    @staticmethod
+    def _load_raw_images(filepath: str, count: int) -> list[int]:
+        """
+        Loads an image file count times, returning one backend handle per load.
+        If a load fails, the handles acquired so far are released before raising.
+        """
+        raw_image_ids: list[int] = []
+        try:
+            for _ in range(count):
+                raw_image_ids.append(backend.load_raw_image(filepath))
+        except Exception:
+            for raw_image_id in raw_image_ids:
+                backend.release_raw_image(raw_image_id)
+            raise
+        return raw_image_ids
+
+    def get_cached_thumbnail(self, raw_image_id: int, filepath: Optional[str] = None):
+        """Returns the thumbnail of a loaded image if it is cached, otherwise None."""
+        thumb_data = self.thumbnail_cache.get(raw_image_id)
+        if thumb_data is None and filepath:
+            file_key = self._get_file_key(filepath)
+            if file_key is not None:
+                thumb_data = self.file_thumbnail_cache.get(file_key)
+                if thumb_data is not None:
+                    self._cache_thumbnail(raw_image_id, file_key, thumb_data)
+        return thumb_data
+
+    def get_thumbnail(self, raw_image_id: int, filepath: Optional[str] = None):
+        """
+        Returns the thumbnail of a loaded image, only asking the backend for it if
+        it isn't cached yet. Raises if the backend fails to extract the thumbnail.
+        """
+        thumb_data = self.get_cached_thumbnail(raw_image_id, filepath)
+        if thumb_data is None:
+            thumb_data = backend.get_thumbnail(raw_image_id)
+            file_key = self._get_file_key(filepath) if filepath else None
+            self._cache_thumbnail(raw_image_id, file_key, thumb_data)
+        return thumb_data
+
+    def prefetch_thumbnail(self, raw_image_id: int, filepath: Optional[str] = None):
+        """
+        Starts extracting the thumbnail of a loaded image in the background, unless
+        it is cached or already being extracted. Emits thumbnail_loaded when done.
+        """
+        if raw_image_id in self._pending_thumbnails:
+            return
+        if self.get_cached_thumbnail(raw_image_id, filepath) is not None:
+            return
+        self._pending_thumbnails[raw_image_id] = self._get_file_key(filepath) if filepath else None
+        QThreadPool.globalInstance().start(_ThumbnailLoader(self, raw_image_id))
+
+    def get_metadata(self, raw_image_id: int) -> dict:
+        """
+        Returns the metadata of a loaded image, only asking the backend for it if
+        it isn't cached yet. Raises if the backend fails to read the metadata.
+        """
+        meta = self.metadata_cache.get(raw_image_id)
+        if meta is None:
+            meta = backend.get_metadata(raw_image_id)
+            self.metadata_cache[raw_image_id] = meta
+        return meta
 
-    def _add_node_with_data(self, node_id: str, node_data: dict):
+    def release_raw_image(self, node_id: str, raw_image_id: int):
+        """
+        Releases the backend image handle held by a node. Nodes showing the same file share
+        a handle, so its cached thumbnail and metadata are only discarded once no other
+        node holds it.
+        """
+        backend.release_raw_image(raw_image_id)
+        if not any(self._get_raw_image_id(node) == raw_image_id
+                   for other_id, node in self.nodes.items() if other_id != node_id):
+            self.discard_image_caches(raw_image_id)
+
+    def discard_image_caches(self, raw_image_id: int):
+        """Forgets the cached thumbnail and metadata of an image that has been released."""
+        self.thumbnail_cache.pop(raw_image_id, None)
+        self.metadata_cache.pop(raw_image_id, None)
+
+    def is_thumbnail_pending(self, raw_image_id: int) -> bool:
+        """Returns whether the thumbnail of an image is being extracted in the background."""
+        return raw_image_id in self._pending_thumbnails
+
+    def _on_thumbnail_loaded(self, raw_image_id: int, thumb_data):
+        if raw_image_id not in self._pending_thumbnails:
+            return  # The model has been cleared in the meantime.
+        file_key = self._pending_thumbnails.pop(raw_image_id)
+        if thumb_data is not None:
+            self._cache_thumbnail(raw_image_id, file_key, thumb_data)
+
+    def _cache_thumbnail(self, raw_image_id: int, file_key: Optional[tuple[str, float]], thumb_data):
+        self.thumbnail_cache[raw_image_id] = thumb_data
+        if file_key is not None:
+            self.file_thumbnail_cache[file_key] = thumb_data
+            self.file_thumbnail_cache.move_to_end(file_key)
+            while len(self.file_thumbnail_cache) > FILE_THUMBNAIL_CACHE_SIZE:
+                self.file_thumbnail_cache.popitem(last=False)
+
+    @staticmethod
+    def _get_file_key(filepath: str) -> Optional[tuple[str, float]]:
+        """Returns a key that identifies the current version of a file, or None if it can't be accessed."""
+        try:
+            return filepath, os.path.getmtime(filepath)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _get_raw_image_id(node: NodeRecord) -> Optional[int]:
+        """Returns the backend image handle held by a node, None if it isn't a loaded ImageLoader."""
+        if node.type != "ImageLoader":
+            return None
+        return node.settings.get("raw_image_id")
+
+    def _index_connection(self, connection_data: dict):
+        """Adds a connection to the per-node connection index."""
+        for node_id in {connection_data["from_node"], connection_data["to_node"]}:
+            self._connections_by_node.setdefault(node_id, []).append(connection_data)
+
+    def _unindex_connection(self, connection_data: dict):
+        """Removes a connection from the per-node connection index."""
+        for node_id in {connection_data["from_node"], connection_data["to_node"]}:
+            node_connections = self._connections_by_node[node_id]
+            node_connections.remove(connection_data)
+            if not node_connections:
+                del self._connections_by_node[node_id]
+
+    def get_node_connections(self, node_id: str) -> list[dict]:
+        """Returns all connections from or to the given node."""
+        return list(self._connections_by_node.get(node_id, []))
+
+    def _add_node_with_data(self, node_id: str, node_data: NodeRecord):
         """
         Private method to add a node with a specific ID and data.
         Used for undo/redo and loading projects.
@@ -122,16 +395,9 @@ class Model(QObject):
 
     def add_node(self, node_type: str, position: QPointF) -> str:
         """Adds a new node to the model and returns its unique ID."""
-        node_id = f"node_{uuid.uuid4().hex[:8]}"
-        while node_id in self.nodes:
-            # This is extremely unlikely, but we should handle it just in case.
-            node_id = f"node_{uuid.uuid4().hex[:8]}"
+        node_id = f"node_{self._id_prefix}{next(self._id_counter):08x}"
 
-        node_data = {
-            "type": node_type,
-            "position": (position.x(), position.y()),
-            "settings": {}
-        }
+        node_data = NodeRecord(sys.intern(node_type), (position.x(), position.y()))
 
         self._add_node_with_data(node_id, node_data)
 
@@ -141,21 +407,13 @@ class Model(QObject):
         """Removes a node and its connections from the model."""
         if node_id in self.nodes:
             # First, remove all connections associated with this node
-            connections_to_remove = [
-                c for c in self.connections
-                if c["from_node"] == node_id or c["to_node"] == node_id
-            ]
-            for conn in connections_to_remove:
+            for conn in self.get_node_connections(node_id):
                 self.remove_connection(conn)
 
             # Free backend resources if this is an image loader node
-            node_data = self.nodes[node_id]
-            if node_data.get("type") == "ImageLoader":
-                raw_image_id = node_data.get("settings", {}).get("raw_image_id")
-                if raw_image_id is not None:
-                    backend.release_raw_image(raw_image_id)
-                    if raw_image_id in self.thumbnail_cache:
-                        del self.thumbnail_cache[raw_image_id]
+            raw_image_id = self._get_raw_image_id(self.nodes[node_id])
+            if raw_image_id is not None:
+                self.release_raw_image(node_id, raw_image_id)
 
             # Remove the node itself from the model
             del self.nodes[node_id]
@@ -165,19 +423,37 @@ class Model(QObject):
             raise ValueError(f"Attempted to remove non-existent node: {node_id}. "
                              "This indicates a logic error in the application.")
 
+    def get_setting(self, node_id: str, key: str, default=None):
+        """Returns a specific setting of a given node, or default if it isn't set."""
+        return self.nodes[node_id].settings.get(key, default)
+
     def update_node_setting(self, node_id: str, key: str, value):
         """Updates a specific setting for a given node."""
         if node_id in self.nodes:
-            self.nodes[node_id]["settings"][key] = value
+            self.nodes[node_id].settings[key] = value
             self.node_setting_changed.emit(node_id, key, value)
         else:
             raise ValueError(f"Attempted to update settings for non-existent node: {node_id}. "
                              "This indicates a logic error in the application.")
 
+    def update_node_settings(self, node_id: str, settings: dict):
+        """
+        Updates several settings of a given node at once.
+
+        Emits a single node_settings_changed signal instead of one
+        node_setting_changed signal per key.
+        """
+        if node_id in self.nodes:
+            self.nodes[node_id].settings.update(settings)
+            self.node_settings_changed.emit(node_id, settings)
+        else:
+            raise ValueError(f"Attempted to update settings for non-existent node: {node_id}. "
+                             "This indicates a logic error in the application.")
+
     def update_node_position(self, node_id: str, position: QPointF):
         """Updates the position of a given node."""
         if node_id in self.nodes:
-            self.nodes[node_id]["position"] = (position.x(), position.y())
+            self.nodes[node_id].position = (position.x(), position.y())
             self.node_position_changed.emit(node_id, position)
         else:
             raise ValueError(f"Attempted to update position for non-existent node: {node_id}. "
@@ -190,20 +466,65 @@ class Model(QObject):
                              f"From: {from_node}, To: {to_node}. "
                              "This indicates a logic error in the application.")
 
-        connection_data = {
-            "from_node": from_node, "from_socket": from_socket,
-            "to_node": to_node, "to_socket": to_socket,
-        }
-        if connection_data not in self.connections:
-            self.connections.append(connection_data)
+        key = Connection(from_node, sys.intern(from_socket), to_node, sys.intern(to_socket))
+        if key not in self.connections:
+            connection_data = key._asdict()
+            self.connections[key] = connection_data
+            self._index_connection(connection_data)
             self.connection_added.emit(connection_data)
         else:
             raise ValueError("Attempted to add connection_data that already exists.")
 
+    def add_connections(self, connections_data: list[dict]):
+        """
+        Adds several connections at once.
+
+        All connections are validated before any of them is added, so either all
+        or none of them end up in the model.
+        """
+        for connection_data in self._insert_connections(connections_data):
+            self.connection_added.emit(connection_data)
+
+    def _insert_connections(self, connections_data: list[dict]) -> list[dict]:
+        """
+        Validates and stores several connections without emitting any signals.
+        Returns the stored connection data.
+        """
+        node_ids = self.nodes.keys()
+        keys = [self._connection_key(c) for c in connections_data]
+        for key in keys:
+            if key.from_node not in node_ids or key.to_node not in node_ids:
+                raise ValueError(f"Attempted to create a connection with a non-existent node. "
+                                 f"From: {key.from_node}, To: {key.to_node}. "
+                                 "This indicates a logic error in the application.")
+        if len(set(keys)) != len(keys) or not self.connections.keys().isdisjoint(keys):
+            raise ValueError("Attempted to add connection_data that already exists.")
+        return self._store_connections(keys)
+
+    @staticmethod
+    def _connection_key(connection_data: dict) -> Connection:
+        """Returns the key of a connection with all of its strings interned."""
+        # The same few socket names (and each node ID) occur in many connections. Interning
+        # them lets all connections share one string object instead of holding copies.
+        return Connection(sys.intern(connection_data["from_node"]), sys.intern(connection_data["from_socket"]),
+                          sys.intern(connection_data["to_node"]), sys.intern(connection_data["to_socket"]))
+
+    def _store_connections(self, keys: list[Connection]) -> list[dict]:
+        """Stores already validated connections without emitting any signals."""
+        stored = []
+        for key in keys:
+            connection_data = key._asdict()
+            self.connections[key] = connection_data
+            self._index_connection(connection_data)
+            stored.append(connection_data)
+        return stored
+
     def remove_connection(self, connection_data: dict):
         """Removes a specific connection."""
-        if connection_data in self.connections:
-            self.connections.remove(connection_data)
+        key = Connection.from_dict(connection_data)
+        if key in self.connections:
+            connection_data = self.connections.pop(key)
+            self._unindex_connection(connection_data)
             self.connection_removed.emit(connection_data)
         else:
             raise ValueError("Attempted to remove connection data that doesn't exist.")
\ No newline at end of file
@@ -1,12 +1,52 @@
 import os
-from typing import Optional
+from typing import Callable, Optional
 from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QPushButton, QFileDialog, QApplication
-from PySide6.QtGui import QPixmap, QPainter, QImage
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtGui import QPixmap, QPainter, QImage, QPixmapCache
+from PySide6.QtCore import Qt, Signal, QSize, QTimer, QObject, QRunnable, QThreadPool
 
-from mpr_photo_editor.model import Model
+from mpr_photo_editor.model import Model, NodeRecord
 from mpr_photo_editor.controller import Controller
-from mpr_photo_editor import backend
+from mpr_photo_editor.helper import RAW_IMAGE_FILTER
+
+# Embedded thumbnails are often full-HD or larger, but the panel only shows them a
+# few hundred pixels wide. They are downscaled to this size (in pixels) once after decoding.
+MAX_THUMBNAIL_DISPLAY_SIZE = 512
+
+# Decoded thumbnails are kept in the global QPixmapCache (keyed by raw image ID), so
+# reopening a panel doesn't decode them again. Its size limit in KB is set in gui.main.
+PIXMAP_CACHE_LIMIT_KB = 64 * 1024
+
+
+def _thumbnail_pixmap_key(raw_image_id: int) -> str:
+    return f"thumbnail_{raw_image_id}"
+
+
+class _ThumbnailDecoderSignals(QObject):
+    # raw_image_id, image (null if the data couldn't be decoded)
+    decoded = Signal(object, QImage)
+
+
+class _ThumbnailDecoder(QRunnable):
+    """
+    Decodes (and downscales) a thumbnail in a worker thread. Only QImage may be used
+    outside the GUI thread, the QPixmap is created once the result is delivered.
+    """
+
+    def __init__(self, raw_image_id: int, thumb_data):
+        super().__init__()
+        self.raw_image_id = raw_image_id
+        self.thumb_data = thumb_data
+        # Created in the GUI thread, so its signal is delivered there.
+        self.signals = _ThumbnailDecoderSignals()
+
+    def run(self):
+        image = QImage()
+        image.loadFromData(self.thumb_data)
+        if max(image.width(), image.height()) > MAX_THUMBNAIL_DISPLAY_SIZE:
+            image = image.scaled(
+                MAX_THUMBNAIL_DISPLAY_SIZE, MAX_THUMBNAIL_DISPLAY_SIZE,
+                Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        self.signals.decoded.emit(self.raw_image_id, image)
 
 
 class CollapsibleBox(QWidget):
@@ -15,6 +55,8 @@ class CollapsibleBox(QWidget):
     def __init__(self, title="", parent=None):
         super().__init__(parent)
         self._title = title
+        # Builds the content on first expansion, see set_content_factory
+        self._content_factory: Optional[Callable[[], None]] = None
         self.title_button = QPushButton()
         self.title_button.setCheckable(True)
         self.title_button.setStyleSheet(
@@ -37,9 +79,24 @@ class CollapsibleBox(QWidget):
     def addWidget(self, widget):
         self.content_layout.addWidget(widget)
 
+    def set_content_factory(self, factory: Callable[[], None]):
+        """
+        Defers creating the content until the box is expanded for the first time.
+        The factory is called once and should add the content with addWidget.
+        """
+        self._content_factory = factory
+        if not self.is_collapsed():
+            self._build_content()
+
+    def _build_content(self):
+        factory, self._content_factory = self._content_factory, None
+        factory()
+
     def on_toggled(self, checked):
         arrow = "▼" if checked else "►"
         self.title_button.setText(f"{arrow} {self._title}")
+        if checked and self._content_factory is not None:
+            self._build_content()
         self.content_widget.setVisible(checked)
 
     def set_collapsed(self, collapsed):
@@ -57,6 +114,12 @@ class AspectRatioLabel(QLabel):
         super().__init__(parent)
         self._pixmap = QPixmap()
 
+        # Smooth scaling is expensive, so the scaled pixmap is reused for as long as
+        # neither the widget size nor the source pixmap change.
+        self._scaled_pixmap = QPixmap()
+        self._scaled_size = QSize()
+        self._scaled_source_key = 0
+
     def setPixmap(self, pixmap: QPixmap | QImage):
         """Sets the pixmap and informs the layout system that the size hint has changed."""
         # Ensure we are working with a QPixmap for internal storage and comparison
@@ -65,8 +128,10 @@ class AspectRatioLabel(QLabel):
         else:
             pixmap_to_set = pixmap
 
-        if self._pixmap != pixmap_to_set:
+        # Comparing cache keys is O(1), they are equal iff both pixmaps share their data
+        if self._pixmap.cacheKey() != pixmap_to_set.cacheKey():
             self._pixmap = pixmap_to_set
+            self._scaled_size = QSize()  # Invalidate the scaled pixmap
             self.updateGeometry()  # Crucial: tells the layout to re-query size hints
             self.update()  # Trigger a repaint
 
@@ -88,7 +153,12 @@ class AspectRatioLabel(QLabel):
         super().paintEvent(event) # Draw background, etc.
         if not self._pixmap.isNull():
             painter = QPainter(self)
-            scaled_pixmap = self._pixmap.scaled(self.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+            size = self.size()
+            if size != self._scaled_size or self._pixmap.cacheKey() != self._scaled_source_key:
+                self._scaled_pixmap = self._pixmap.scaled(size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+                self._scaled_size = size
+                self._scaled_source_key = self._pixmap.cacheKey()
+            scaled_pixmap = self._scaled_pixmap
             # Center the pixmap
             x = (self.width() - scaled_pixmap.width()) / 2
             y = (self.height() - scaled_pixmap.height()) / 2
@@ -140,12 +210,11 @@ def get_node_panel(node_id: str, model: Model, controller: Controller, parent=No
     if not node_data:
         return QLabel("Node not found in model.", parent=parent)
 
-    node_type = node_data.get("type")
+    node_type = node_data.type
 
-    if node_type == "ImageLoader":
-        return _ImageLoaderPanel(node_id, node_data, controller, parent=parent)
-    elif node_type == "BlackLevels":
-        return _black_levels_panel(node_id, node_data, controller, parent=parent)
+    panel_factory = _PANEL_FACTORIES.get(node_type)
+    if panel_factory is not None:
+        return panel_factory(node_id, node_data, controller, parent=parent)
 
     return QLabel(f"No panel available for node type: {node_type}", parent=parent)
 
@@ -153,28 +222,44 @@ def get_node_panel(node_id: str, model: Model, controller: Controller, parent=No
 class _ImageLoaderPanel(QWidget):
     """The settings panel widget for the ImageLoader node."""
 
-    def __init__(self, node_id: str, node_data: dict, controller: Controller, parent=None):
+    def __init__(self, node_id: str, node_data: NodeRecord, controller: Controller, parent=None):
         super().__init__(parent)
         self.node_id = node_id
         self.controller = controller
         self.model = controller.model
         self.original_pixmap: Optional[QPixmap] = None
+        # The image whose metadata the labels currently show
+        self._metadata_image_id: Optional[int] = None
+        # Metadata whose (long) "All Metadata" text is only built once that box is expanded
+        self._pending_full_metadata: Optional[dict] = None
+        # The text of the "All Metadata" box, kept until its label is created
+        self._full_metadata_text = "No metadata available."
+        # The image whose thumbnail is being decoded in the background
+        self._decoding_image_id: Optional[int] = None
+
+        # raw_image_id can change several times in a row (undo/redo bursts), so the panel
+        # is only updated once per event loop iteration, for the latest image.
+        self._pending_raw_image_id: Optional[int] = None
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(0)
+        self._update_timer.timeout.connect(self._apply_pending_update)
 
         self._init_ui(node_data)
         self._connect_signals()
 
         # --- Initial State ---
         self.settings_box.set_collapsed(False)
-        initial_raw_image_id = node_data.get("settings", {}).get("raw_image_id")
+        initial_raw_image_id = node_data.settings.get("raw_image_id")
         self.update_panel_info(initial_raw_image_id)
 
-    def _init_ui(self, node_data: dict):
+    def _init_ui(self, node_data: NodeRecord):
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(0, 0, 0, 0)
 
         # --- Settings Box ---
         self.settings_box = CollapsibleBox("Image Loader Settings")
-        filepath = node_data.get("settings", {}).get("filepath")
+        filepath = node_data.settings.get("filepath")
         file_label_text = f"File: {os.path.basename(filepath)}" if filepath else "File: No file selected"
         self.file_label = QLabel(file_label_text)
         self.file_label.setWordWrap(True)
@@ -199,25 +284,37 @@ class _ImageLoaderPanel(QWidget):
         main_layout.addWidget(self.metadata_box)
 
         # --- Full Metadata Box ---
+        # Collapsed by default and often never opened, so its label is only created on demand
         self.full_metadata_box = CollapsibleBox("All Metadata")
-        self.full_metadata_label = QLabel("No metadata available.")
-        self.full_metadata_label.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.full_metadata_label.setWordWrap(True)
-        self.full_metadata_box.addWidget(self.full_metadata_label)
-        self.full_metadata_box.set_collapsed(True)  # Collapsed by default
+        self.full_metadata_label: Optional[QLabel] = None
+        self.full_metadata_box.set_collapsed(True)
+        self.full_metadata_box.set_content_factory(self._create_full_metadata_label)
         main_layout.addWidget(self.full_metadata_box)
 
         main_layout.addStretch()  # Push everything to the top
 
     def _connect_signals(self):
         self.select_button.clicked.connect(self._on_select_file)
-        self.model.node_setting_changed.connect(self._on_setting_changed)
-        self.destroyed.connect(lambda: self.model.node_setting_changed.disconnect(self._on_setting_changed))
+        self.full_metadata_box.title_button.toggled.connect(self._on_full_metadata_toggled)
+
+        # Disconnecting by connection handle doesn't have to search the signal's slots
+        model_connections = [
+            self.model.node_setting_changed.connect(self._on_setting_changed),
+            self.model.node_settings_changed.connect(self._on_settings_changed),
+            self.model.thumbnail_loaded.connect(self._on_thumbnail_loaded),
+        ]
+
+        def disconnect_from_model():
+            for connection in model_connections:
+                QObject.disconnect(connection)
+
+        self.destroyed.connect(disconnect_from_model)
 
     def _on_select_file(self):
         new_filepath, _ = QFileDialog.getOpenFileName(
             None, "Select Image File", "",
-            "Raw Images (*.cr2 *.nef *.arw *.dng *.rw2 *.orf *.raf *.srw *.pef);;All Files (*)")
+            RAW_IMAGE_FILTER,
+            options=QFileDialog.Option.DontUseCustomDirectoryIcons)
         if new_filepath:
             QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
             try:
@@ -233,7 +330,52 @@ class _ImageLoaderPanel(QWidget):
                      new_filepath = os.path.basename(str(value))
                 self.file_label.setText(f"File: {new_filepath}")
             elif key == "raw_image_id":
-                self.update_panel_info(value)
+                self._pending_raw_image_id = value
+                self._update_timer.start()
+
+    def _apply_pending_update(self):
+        self.update_panel_info(self._pending_raw_image_id)
+
+    def _on_settings_changed(self, changed_node_id, settings):
+        if changed_node_id == self.node_id:
+            for key, value in settings.items():
+                self._on_setting_changed(changed_node_id, key, value)
+
+    def _on_thumbnail_loaded(self, raw_image_id, thumb_data):
+        if self.node_id in self.model.nodes and raw_image_id == self.model.get_setting(self.node_id, "raw_image_id"):
+            self._show_thumbnail(raw_image_id, thumb_data)
+
+    def _show_thumbnail(self, raw_image_id: int, thumb_data):
+        if thumb_data:
+            # Decoding a large JPEG takes tens of milliseconds, do it off the GUI thread.
+            self.original_pixmap = None
+            self.thumbnail_label.setText("Loading thumbnail...")
+            self.thumbnail_label.setPixmap(QPixmap()) # Clear pixmap
+            if raw_image_id != self._decoding_image_id:
+                self._decoding_image_id = raw_image_id
+                decoder = _ThumbnailDecoder(raw_image_id, thumb_data)
+                decoder.signals.decoded.connect(self._on_thumbnail_decoded)
+                QThreadPool.globalInstance().start(decoder)
+        else:
+            self._show_thumbnail_error()
+
+    def _on_thumbnail_decoded(self, raw_image_id: int, image: QImage):
+        if raw_image_id != self._decoding_image_id:
+            return  # The panel shows another image by now
+        self._decoding_image_id = None
+        if image.isNull():
+            self._show_thumbnail_error()
+            return
+        self.thumbnail_label.setText("")
+        self.original_pixmap = QPixmap.fromImage(image)
+        QPixmapCache.insert(_thumbnail_pixmap_key(raw_image_id), self.original_pixmap)
+        self.thumbnail_label.setPixmap(self.original_pixmap)
+
+    def _show_thumbnail_error(self):
+        self._decoding_image_id = None
+        self.original_pixmap = None
+        self.thumbnail_label.setText("Thumbnail Error")
+        self.thumbnail_label.setPixmap(QPixmap()) # Clear pixmap
 
     def update_panel_info(self, raw_image_id: Optional[int]):
         if raw_image_id is not None:
@@ -242,28 +384,32 @@ class _ImageLoaderPanel(QWidget):
             self.full_metadata_box.setVisible(True)
 
             # --- Update Thumbnail ---
-            thumb_data = self.model.thumbnail_cache.get(raw_image_id)
-            if thumb_data is None:
+            cached_pixmap = QPixmap()
+            if QPixmapCache.find(_thumbnail_pixmap_key(raw_image_id), cached_pixmap):
+                self._decoding_image_id = None
+                self.thumbnail_label.setText("")
+                self.original_pixmap = cached_pixmap
+                self.thumbnail_label.setPixmap(cached_pixmap)
+            elif self.model.is_thumbnail_pending(raw_image_id):
+                # It's being extracted in the background, _on_thumbnail_loaded shows it.
+                self.original_pixmap = None
+                self._decoding_image_id = None
+                self.thumbnail_label.setText("Loading thumbnail...")
+                self.thumbnail_label.setPixmap(QPixmap()) # Clear pixmap
+            else:
                 try:
-                    thumb_data = backend.get_thumbnail(raw_image_id)
-                    self.model.thumbnail_cache[raw_image_id] = thumb_data
+                    filepath = self.model.get_setting(self.node_id, "filepath")
+                    thumb_data = self.model.get_thumbnail(raw_image_id, filepath)
                 except Exception as e:
                     print(f"Error getting thumbnail: {e}")
                     thumb_data = None
-
-            if thumb_data:
-                self.thumbnail_label.setText("")  
-                self.original_pixmap = QPixmap()
-                self.original_pixmap.loadFromData(thumb_data)
-                self.thumbnail_label.setPixmap(self.original_pixmap)
-            else:
-                self.original_pixmap = None
-                self.thumbnail_label.setText("Thumbnail Error")
-                self.thumbnail_label.setPixmap(QPixmap()) # Clear pixmap
+                self._show_thumbnail(raw_image_id, thumb_data)
 
             # --- Update Metadata ---
+            if raw_image_id == self._metadata_image_id:
+                return  # The labels are up to date already
             try:
-                meta = backend.get_metadata(raw_image_id)
+                meta = self.model.get_metadata(raw_image_id)
                 # Key metadata
                 meta_text = (
                     f"<b>Make:</b> {meta.get('make', 'N/A')}<br>"
@@ -275,32 +421,64 @@ class _ImageLoaderPanel(QWidget):
                 self.metadata_label.setText(meta_text)
 
                 # Full metadata
-                full_meta_text = "<br>".join(
-                    f"<b>{key}:</b> {value}" for key, value in sorted(meta.items())
-                )
-                self.full_metadata_label.setText(full_meta_text)
+                if self.full_metadata_box.is_collapsed():
+                    self._pending_full_metadata = meta
+                else:
+                    self._set_full_metadata(meta)
+                self._metadata_image_id = raw_image_id
 
             except Exception as e:
                 print(f"Error getting metadata: {e}")
                 self.metadata_label.setText("Metadata Error")
-                self.full_metadata_label.setText("Metadata Error")
+                self._set_full_metadata_text("Metadata Error")
         else:
             # No image loaded
             self.original_pixmap = None
+            self._decoding_image_id = None
+            self._metadata_image_id = None
             self.thumbnail_box.set_collapsed(True)
             self.metadata_box.set_collapsed(True)
             self.full_metadata_box.setVisible(False)
             self.thumbnail_label.setText("No thumbnail available.")
             self.thumbnail_label.setPixmap(QPixmap()) # Clear pixmap
             self.metadata_label.setText("No metadata available.")
-            self.full_metadata_label.setText("No metadata available.")
+            self._set_full_metadata_text("No metadata available.")
+
+    def _create_full_metadata_label(self):
+        self.full_metadata_label = QLabel(self._full_metadata_text)
+        self.full_metadata_label.setAlignment(Qt.AlignmentFlag.AlignTop)
+        self.full_metadata_label.setWordWrap(True)
+        self.full_metadata_box.addWidget(self.full_metadata_label)
+
+    def _set_full_metadata_text(self, text: str):
+        self._pending_full_metadata = None
+        self._full_metadata_text = text
+        if self.full_metadata_label is not None:
+            self.full_metadata_label.setText(text)
 
+    def _on_full_metadata_toggled(self, expanded: bool):
+        if expanded and self._pending_full_metadata is not None:
+            self._set_full_metadata(self._pending_full_metadata)
 
-def _black_levels_panel(node_id: str, node_data: dict, controller: Controller, parent=None):
+    def _set_full_metadata(self, meta: dict):
+        full_meta_text = "<br>".join(
+            f"<b>{key}:</b> {value}" for key, value in sorted(meta.items())
+        )
+        self._set_full_metadata_text(full_meta_text)
+
+
+def _black_levels_panel(node_id: str, node_data: NodeRecord, controller: Controller, parent=None):
     """Creates the settings panel for the BlackLevels node."""
     panel = QWidget(parent)
     layout = QVBoxLayout(panel)
     layout.addWidget(QLabel("Black Levels Settings"))
     # TODO: Add sliders and input fields for black level settings here.
     # They would call controller.update_node_setting(...) on change.
-    return panel
\ No newline at end of file
+    return panel
+
+
+# Maps node types to the callables that build their settings panels (see get_node_panel)
+_PANEL_FACTORIES = {
+    "ImageLoader": _ImageLoaderPanel,
+    "BlackLevels": _black_levels_panel,
+}
@@ -2,16 +2,29 @@ from __future__ import annotations
 import os
 from typing import cast, Optional
 
-from PySide6.QtWidgets import QApplication, QGraphicsItem, QGraphicsEllipseItem, QGraphicsRectItem, QGraphicsSceneMouseEvent, QGraphicsTextItem, QGraphicsPathItem, QGraphicsScene, QGraphicsView, QFileDialog, QPushButton, QGraphicsProxyWidget, QMenu, QGraphicsSceneContextMenuEvent
-from PySide6.QtGui import QPainterPath, QPen, QColor, QPainter, QBrush, QTransform, QCursor, QMouseEvent
-from PySide6.QtCore import QRectF, QPointF, Qt, QEvent, Signal
+from PySide6.QtWidgets import QApplication, QWidget, QGraphicsItem, QGraphicsEllipseItem, QGraphicsRectItem, QGraphicsSceneMouseEvent, QGraphicsTextItem, QGraphicsPathItem, QGraphicsScene, QGraphicsView, QFileDialog, QPushButton, QGraphicsProxyWidget, QMenu, QGraphicsSceneContextMenuEvent
+from PySide6.QtGui import QPainterPath, QPen, QColor, QPainter, QBrush, QTransform, QCursor, QMouseEvent, QSurfaceFormat, QAction, QFontMetricsF
+from PySide6.QtCore import QRectF, QPointF, QSizeF, Qt, QEvent, Signal, QTimer
+
+try:
+    from PySide6.QtOpenGLWidgets import QOpenGLWidget
+    HAS_OPENGL = True
+except ImportError:  # Qt without OpenGL support, the view uses the raster viewport
+    HAS_OPENGL = False
 
 from mpr_photo_editor.controller import Controller
-from mpr_photo_editor.model import Model
-from mpr_photo_editor.helper import dp
+from mpr_photo_editor.model import Model, Connection
+from mpr_photo_editor.helper import dp, RAW_IMAGE_FILTER
 # from mpr_photo_editor.helper import BackgroundRectHelper
 
 
+def blend_color(color1, color2, ratio):
+    r = color1.red() * (1 - ratio) + color2.red() * ratio
+    g = color1.green() * (1 - ratio) + color2.green() * ratio
+    b = color1.blue() * (1 - ratio) + color2.blue() * ratio
+    return QColor(int(r), int(g), int(b))
+
+
 # Type categories
 class SocketType:
     RAW = "Raw"
@@ -29,6 +42,11 @@ class SocketType:
         NUMBER: QColor("#7B1FA2"),     # purple
     }
 
+    # Connections are drawn in their output socket's color blended with gray
+    CONNECTION_COLORS = {
+        socket_type: blend_color(color, QColor("gray"), 0.5) for socket_type, color in COLORS.items()
+    }
+
 
 # Refactored NodeSocket as a factory with subclasses for different connection types.
 class NodeSocketFactory:
@@ -55,10 +73,20 @@ class NodeSocket:
     def add_connection(self, connection):
         if connection not in self.connections:
             self.connections.append(connection)
+            self.get_parent_node()._connections.append(connection)
 
     def remove_connection(self, connection):
         if connection in self.connections:
             self.connections.remove(connection)
+            self.get_parent_node()._connections.remove(connection)
+
+    def scene_point(self) -> QPointF:
+        """
+        Returns the socket's position in scene coordinates. Sockets never move within
+        their node and nodes are neither rotated nor scaled, so this is a plain offset
+        of the node's position rather than a full scenePos() transform.
+        """
+        return self.get_parent_node().pos() + self._local_point  # type: ignore
 
     def get_parent_node(self) -> NodeBase:
         """A type-hinted helper to get the parent item as a NodeBase."""
@@ -74,12 +102,16 @@ class SingleConnectionNodeSocket(NodeSocket, QGraphicsEllipseItem):
             NodeSocket.DIAMETER, NodeSocket.DIAMETER, parent)
         
         self.setPos(x, y)
+        self._local_point = QPointF(x, y)
         self.setBrush(SocketType.COLORS.get(socket_type, QColor("gray")))
+        # Sockets never change their appearance, see NodeBase
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
     
     def add_connection(self, connection):
         if len(self.connections) > 0:
             self.connections[0].delete()
         self.connections.append(connection)
+        self.get_parent_node()._connections.append(connection)
 
 
 class MultiConnectionNodeSocket(NodeSocket, QGraphicsRectItem):
@@ -90,7 +122,10 @@ class MultiConnectionNodeSocket(NodeSocket, QGraphicsRectItem):
         QGraphicsRectItem.__init__(self, -side/2, -side/2, side, side, parent)
 
         self.setPos(x, y)
+        self._local_point = QPointF(x, y)
         self.setBrush(SocketType.COLORS.get(socket_type, QColor("gray")))
+        # Sockets never change their appearance, see NodeBase
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
 
     def paint(self, painter, option, widget=None):
         painter.setBrush(self.brush())
@@ -99,22 +134,49 @@ class MultiConnectionNodeSocket(NodeSocket, QGraphicsRectItem):
 
 
 class NodeBase(QGraphicsItem):
+    # Shared by all nodes, so that they don't create their own pens
+    BORDER_PEN = QPen(QColor(Qt.GlobalColor.black), 1)
+    SELECTED_PEN = QPen(QColor("#E0C708"), 3, Qt.PenStyle.SolidLine)
+    # Created on first use (menus need a QApplication), see _get_context_menu
+    _context_menu: Optional[tuple[QMenu, QAction]] = None
+    # The metrics of the application font, created on first use, see _measure_label
+    _label_metrics: Optional[QFontMetricsF] = None
+    CORNER_RADIUS = 5
+
     def __init__(self, name, height=dp(60), width=dp(120)):
         super().__init__()
         self.name = name
-        self.width = width
-        self.height = height
+        self._width = width
+        self._height = height
         self.node_id: Optional[str] = None
         self._drag_start_pos: Optional[QPointF] = None
 
         self.inputs = []
         self.outputs = []
+        # The sockets by name, to resolve the sockets of model connections
+        self.inputs_by_name: dict[str, NodeSocket] = {}
+        self.outputs_by_name: dict[str, NodeSocket] = {}
+        # All connections attached to any of the sockets, kept by NodeSocket, so that
+        # moving the node doesn't have to collect them from every socket
+        self._connections: list[NodeConnection] = []
         self.output_labels = []
 
         self.title_height = dp(35)
         self.title_offset = dp(13)
         self.vertical_item_offset = dp(-9)
 
+        self.bg_color = QColor(70, 70, 70)
+        self.title_bg_color = QColor(50, 50, 50)
+
+        # The node is drawn by child items rather than by a Python paint() method. They are
+        # created first, so that they are stacked below the title, labels and sockets.
+        self._body_item = self._create_shape_item(self.BORDER_PEN, QBrush(self.bg_color))
+        self._title_item = self._create_shape_item(self.BORDER_PEN, QBrush(self.title_bg_color))
+        # Selecting a node only shows or hides its border instead of repainting the node
+        self._selection_item = self._create_shape_item(self.SELECTED_PEN, QBrush(Qt.BrushStyle.NoBrush))
+        self._selection_item.setVisible(False)
+        self._update_shapes()
+
         self.title = QGraphicsTextItem(name, self)
         self.title.setDefaultTextColor(QColor(Qt.GlobalColor.white))
         self.set_title(name)
@@ -122,25 +184,80 @@ class NodeBase(QGraphicsItem):
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
-
-        self.bg_color = QColor(70, 70, 70)
-        self.title_bg_color = QColor(50, 50, 50)
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemHasNoContents)
+
+    def _create_shape_item(self, pen: QPen, brush: QBrush) -> QGraphicsPathItem:
+        item = QGraphicsPathItem(self)
+        item.setPen(pen)
+        item.setBrush(brush)
+        # Mouse presses go through to the node, which handles moving and selecting
+        item.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+        # The shapes only change with the node's size, so they're rendered into a pixmap
+        # once and blitted while the view is panned or the node is moved.
+        item.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        return item
     
     def itemChange(self, change, value):
         # BackgroundRectHelper.add_scene_background_rect()
-        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
-            for socket in self.outputs:
-                socket.update_connections()
-
-            for socket in self.inputs:
-                socket.update_connections()
+        # Most nodes being dragged around while building a graph aren't connected yet
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged and self._connections:
+            scene = self.scene()
+            if scene is not None:
+                cast(NodeScene, scene).update_connections_later(self._connections)
+        elif change == QGraphicsItem.GraphicsItemChange.ItemSelectedHasChanged:
+            self._selection_item.setVisible(bool(value))
         return super().itemChange(change, value)
 
+    @property
+    def width(self) -> float:
+        return self._width
+
+    @width.setter
+    def width(self, width: float):
+        self.prepareGeometryChange()
+        self._width = width
+        self._update_shapes()
+
+    @property
+    def height(self) -> float:
+        return self._height
+
+    @height.setter
+    def height(self, height: float):
+        self.prepareGeometryChange()
+        self._height = height
+        self._update_shapes()
+
+    def _update_shapes(self):
+        """
+        Rebuilds the bounding rect and the outlines of the child items that draw the node.
+        Qt asks for the bounding rect very often, so it's only built when the size changes.
+        """
+        radius = self.CORNER_RADIUS
+        self._bounding_rect = QRectF(0, 0, self._width, self._height)
+
+        self._body_path = QPainterPath()
+        self._body_path.addRoundedRect(self._bounding_rect, radius, radius)
+
+        # The title bar is only rounded at the top, its bottom edge lies on the body
+        self._title_path = QPainterPath()
+        self._title_path.moveTo(0, self.title_height)
+        self._title_path.arcTo(0, 0, 2 * radius, 2 * radius, 180, -90)
+        self._title_path.arcTo(self._width - 2 * radius, 0, 2 * radius, 2 * radius, 90, -90)
+        self._title_path.lineTo(self._width, self.title_height)
+        self._title_path.closeSubpath()
+
+        self._body_item.setPath(self._body_path)
+        self._title_item.setPath(self._title_path)
+        # Drawn on top of the outer black border, so that it fully covers it
+        self._selection_item.setPath(self._body_path)
+
     def set_title(self, title):
         self.title.setPlainText(title)
         
-        title_width = self.title.boundingRect().width()
-        title_height = self.title.boundingRect().height()
+        title_rect = self.title.boundingRect()
+        title_width = title_rect.width()
+        title_height = title_rect.height()
 
         self.title.setPos(
             (self.width - title_width) / 2, 
@@ -155,84 +272,94 @@ class NodeBase(QGraphicsItem):
         """Virtual method to allow subclasses to react to setting changes"""
         pass
 
+    def on_settings_changed(self, node_id: str, settings: dict):
+        """Reacts to several settings changing at once, one key at a time by default."""
+        for key, value in settings.items():
+            self.on_setting_changed(node_id, key, value)
+
     def boundingRect(self):
-        return QRectF(0, 0, self.width, self.height)
+        return self._bounding_rect
 
     def paint(self, painter, option, widget=None):
-        painter.setPen(QPen(QColor(Qt.GlobalColor.black), 1))
-        painter.setBrush(QBrush(self.bg_color))
-        painter.drawRoundedRect(0, 0, self.width, self.height, 5, 5)
-
-        painter.setBrush(QBrush(self.title_bg_color))
-        painter.drawRoundedRect(0, 0, self.width, self.title_height, 5, 5)
-
-        # Draw border highlight if selected
-        if self.isSelected():
-            border_color = QColor("#E0C708")
-            pen = QPen(border_color, 3)
-            pen.setStyle(Qt.PenStyle.SolidLine)
-            painter.setPen(pen)
-            painter.setBrush(Qt.BrushStyle.NoBrush)
-            # Draw the selected border so it fully covers the outer black border
-            painter.drawRoundedRect(0, 0, self.width, self.height, 5, 5)
+        # Not called because of ItemHasNoContents, the child items draw the node
+        pass
+
+    @staticmethod
+    def _measure_label(label: QGraphicsTextItem, label_text: str) -> QSizeF:
+        """
+        Returns the size of a single line label, like label.boundingRect() would. Measuring
+        with font metrics avoids laying out the label's text document just to position it.
+        """
+        if NodeBase._label_metrics is None:
+            NodeBase._label_metrics = QFontMetricsF(QApplication.font())
+        metrics = NodeBase._label_metrics
+        margin = 2 * label.document().documentMargin()
+        return QSizeF(metrics.horizontalAdvance(label_text) + margin, metrics.height() + margin)
 
     def add_input(self, socket_type, label_text, y_offset=None, single_connection=True):
         label = QGraphicsTextItem(label_text, self)
         label.setDefaultTextColor(QColor(Qt.GlobalColor.white))
 
         # explicitly assuming that each label only covers one single line
+        label_height = self._measure_label(label, label_text).height()
         y = y_offset or self.title_height + self.title_offset
-        y += len(self.inputs) * (self.vertical_item_offset + label.boundingRect().height())
+        y += len(self.inputs) * (self.vertical_item_offset + label_height)
 
         label.setPos(
             NodeSocket.DIAMETER / 2,
-            y - label.boundingRect().height() / 2
+            y - label_height / 2
         )
         self.output_labels.append(label)
 
         socket = NodeSocketFactory(0, y, is_input=True, socket_type=socket_type, parent=self, single_connection=single_connection)
         socket.name = f"{label_text}_in"
         self.inputs.append(socket)
+        self.inputs_by_name[socket.name] = socket
 
     def add_output(self, socket_type, label_text, y_offset=None):
         label = QGraphicsTextItem(label_text, self)
         label.setDefaultTextColor(QColor(Qt.GlobalColor.white))
 
         # explicitly assuming that each label only covers one single line
+        label_rect = self._measure_label(label, label_text)
         y = y_offset or self.title_height + self.title_offset
-        y += len(self.outputs) * (self.vertical_item_offset + label.boundingRect().height())
+        y += len(self.outputs) * (self.vertical_item_offset + label_rect.height())
 
         label.setPos(
-            self.width - label.boundingRect().width() - NodeSocket.DIAMETER / 2,
-            y - label.boundingRect().height() / 2
+            self.width - label_rect.width() - NodeSocket.DIAMETER / 2,
+            y - label_rect.height() / 2
         )
         self.output_labels.append(label)
 
         socket = NodeSocketFactory(self.width, y, is_input=False, socket_type=socket_type, parent=self, single_connection=False)
         socket.name = f"{label_text}_out"
         self.outputs.append(socket)
+        self.outputs_by_name[socket.name] = socket
 
     def add_input_output(self, socket_type, label_text, y_offset=None, single_connection=True):
         label = QGraphicsTextItem(label_text, self)
         label.setDefaultTextColor(QColor(Qt.GlobalColor.white))
 
         # explicitly assuming that each label only covers one single line
+        label_rect = self._measure_label(label, label_text)
         y = y_offset or self.title_height + self.title_offset
-        y += len(self.outputs) * (self.vertical_item_offset + label.boundingRect().height())
+        y += len(self.outputs) * (self.vertical_item_offset + label_rect.height())
         
         label.setPos(
-            (self.width - label.boundingRect().width()) / 2,
-            y - label.boundingRect().height() / 2
+            (self.width - label_rect.width()) / 2,
+            y - label_rect.height() / 2
         )
         self.output_labels.append(label)
 
         socket = NodeSocketFactory(0, y, is_input=True, socket_type=socket_type, parent=self, single_connection=single_connection)
         socket.name = f"{label_text}_in"
         self.inputs.append(socket)
+        self.inputs_by_name[socket.name] = socket
 
         socket = NodeSocketFactory(self.width, y, is_input=False, socket_type=socket_type, parent=self, single_connection=False)
         socket.name = f"{label_text}_out"
         self.outputs.append(socket)
+        self.outputs_by_name[socket.name] = socket
 
     def mousePressEvent(self, event: QGraphicsSceneMouseEvent) -> None:
         if self.get_scene().socket_active:
@@ -261,16 +388,24 @@ class NodeBase(QGraphicsItem):
             self._drag_start_pos = None
         
     def contextMenuEvent(self, event):
-        menu = QMenu()
-        delete_action = menu.addAction("Delete Node")
+        menu, delete_action = self._get_context_menu()
         action = menu.exec(event.screenPos())
         if action == delete_action and self.node_id:
             self.get_scene().controller.remove_node(self.node_id)
 
+    @staticmethod
+    def _get_context_menu() -> tuple[QMenu, QAction]:
+        """Returns the context menu shared by all nodes and its delete action, creating them once."""
+        if NodeBase._context_menu is None:
+            menu = QMenu()
+            NodeBase._context_menu = (menu, menu.addAction("Delete Node"))
+        return NodeBase._context_menu
+
     def delete_node(self):
-        for socket in self.inputs + self.outputs:
-            for connection in socket.connections[:]:
-                connection.delete()
+        # A copy, since deleting a connection removes it from the list. The set
+        # deletes a connection to the node itself only once.
+        for connection in set(self._connections):
+            connection.delete()
 
         if self.scene():
             self.scene().removeItem(self)
@@ -301,10 +436,9 @@ class NodeImageLoader(NodeBase):
             """
         )
         self.select_button_proxy.setWidget(self.select_button)
-        self.select_button_proxy.setPos(
-            (self.width - self.select_button_proxy.boundingRect().width()) / 2, y
-        )
-        y += self.select_button_proxy.boundingRect().height()
+        button_rect = self.select_button_proxy.boundingRect()
+        self.select_button_proxy.setPos((self.width - button_rect.width()) / 2, y)
+        y += button_rect.height()
         self.select_button.clicked.connect(self.select_file)
 
         # label showing filename
@@ -313,7 +447,7 @@ class NodeImageLoader(NodeBase):
         self.file_label.setPos(
             (self.width - self.file_label.boundingRect().width()) / 2, y
         )
-        y += self.select_button_proxy.boundingRect().height() * 1.5 + self.title_offset
+        y += button_rect.height() * 1.5 + self.title_offset
 
         # add outputs
         self.add_output(SocketType.RAW, "RAW", y_offset=y)
@@ -329,7 +463,8 @@ class NodeImageLoader(NodeBase):
 
         file_path, _ = QFileDialog.getOpenFileName(
             None, "Select Image File", "",
-            "Raw Images (*.cr2 *.nef *.arw *.dng *.rw2 *.orf *.raf *.srw *.pef);;All Files (*)")
+            RAW_IMAGE_FILTER,
+            options=QFileDialog.Option.DontUseCustomDirectoryIcons)
 
         if file_path and self.node_id:
             self.get_scene().controller.update_node_setting(self.node_id, "filepath", file_path)
@@ -358,13 +493,23 @@ class NodeBlackLevels(NodeBase):
 
 
 class NodeConnection(QGraphicsPathItem):
+    # The horizontal distance of the curve's control points from the sockets
+    CONTROL_OFFSET = 50
+    # Below this (manhattan) length a connection is drawn as a straight line. The curve
+    # would only make a small loop between sockets that are (almost) on top of each other.
+    MIN_CURVE_LENGTH = 50
+
     def __init__(self, start_socket, end_socket):
         super().__init__()
         self.start_socket = start_socket
         self.end_socket = end_socket
-        blended_color = self.blend_color(self.start_socket.brush().color(), QColor("gray"), 0.5)
+        blended_color = SocketType.CONNECTION_COLORS.get(self.start_socket.socket_type, QColor("gray"))
         self.conn_data: Optional[dict] = None
-        self.setPen(QPen(blended_color, 2))
+        self._pen = QPen(blended_color, 2)
+        self._selected_pen = QPen(blended_color.lighter(150), 2)  # brighter when selected
+        self.setPen(self._pen)
+        # The socket positions the current path was built for
+        self._endpoints: Optional[tuple[QPointF, QPointF]] = None
         self.update_path()
         self.setZValue(-1)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable)
@@ -381,27 +526,27 @@ class NodeConnection(QGraphicsPathItem):
             self.end_socket.installSceneEventFilter(self)
 
     def update_path(self):
-        p1 = self.start_socket.scenePos()
-        p2 = self.end_socket.scenePos()
+        p1 = self.start_socket.scene_point()
+        p2 = self.end_socket.scene_point()
+        if (p1, p2) == self._endpoints:
+            return  # e.g. a node was moved and moved back before the update ran
+        self._endpoints = (p1, p2)
+        self.setPath(self.build_path(p1, p2))
+
+    @classmethod
+    def build_path(cls, p1: QPointF, p2: QPointF) -> QPainterPath:
+        """Returns the path of a connection from an output at p1 to an input at p2."""
         path = QPainterPath(p1)
-        ctr1 = QPointF(p1.x() + 50, p1.y())
-        ctr2 = QPointF(p2.x() - 50, p2.y())
-        path.cubicTo(ctr1, ctr2, p2)
-        self.setPath(path)
-
-    def blend_color(self, color1, color2, ratio):
-        r = color1.red() * (1 - ratio) + color2.red() * ratio
-        g = color1.green() * (1 - ratio) + color2.green() * ratio
-        b = color1.blue() * (1 - ratio) + color2.blue() * ratio
-        return QColor(int(r), int(g), int(b))
+        if (p2 - p1).manhattanLength() < cls.MIN_CURVE_LENGTH:
+            path.lineTo(p2)
+        else:
+            ctr1 = QPointF(p1.x() + cls.CONTROL_OFFSET, p1.y())
+            ctr2 = QPointF(p2.x() - cls.CONTROL_OFFSET, p2.y())
+            path.cubicTo(ctr1, ctr2, p2)
+        return path
 
     def paint(self, painter, option, widget=None):
-        color = self.pen().color()
-        if self.isSelected():
-            color = color.lighter(150)  # brighten the color when selected
-
-        pen = QPen(color, 2)
-        painter.setPen(pen)
+        painter.setPen(self._selected_pen if self.isSelected() else self._pen)
         painter.setBrush(Qt.BrushStyle.NoBrush)
         painter.drawPath(self.path())
 
@@ -414,7 +559,14 @@ class NodeScene(QGraphicsScene):
         self.controller = controller
         self.model = model
 
+        # A node graph has few items that move a lot (nodes being dragged, connections
+        # following them). Keeping a BSP tree over the large scene rect up to date costs
+        # more than a linear scan of the items.
+        self.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
+
         self.temp_connection: Optional[QGraphicsPathItem] = None
+        # Where the path of temp_connection currently ends
+        self._temp_connection_end: Optional[QPointF] = None
         self.start_socket: Optional[NodeSocket] = None
         self.socket_active = False
 
@@ -422,15 +574,45 @@ class NodeScene(QGraphicsScene):
         # to create and delete UI nodes when the model changes.
         self.node_items: dict[str, NodeBase] = {}
 
-        # A map from connection data to the QGraphicsPathItem for easy removal.
-        self.connection_items: dict[frozenset, NodeConnection] = {}
+        # Building a menu creates widgets, so it's only done once, see _get_context_menu
+        self._context_menu: Optional[QMenu] = None
+
+        # A map from connection key to the QGraphicsPathItem for easy removal.
+        self.connection_items: dict[Connection, NodeConnection] = {}
+
+        # A node moves many times per frame while it's dragged. The paths of its connections
+        # are only rebuilt once per event loop iteration, see update_connections_later.
+        self._dirty_connections: set[NodeConnection] = set()
+        self._connection_update_timer = QTimer(self)
+        self._connection_update_timer.setSingleShot(True)
+        self._connection_update_timer.setInterval(0)
+        self._connection_update_timer.timeout.connect(self._update_dirty_connections)
 
         # Connect to model signals to make the UI data-driven
         self.model.node_added.connect(self.on_node_added)
         self.model.node_removed.connect(self.on_node_removed)
         self.model.connection_added.connect(self.on_connection_added)
         self.model.connection_removed.connect(self.on_connection_removed)
+        self.model.graph_loaded.connect(self.on_graph_loaded)
+        self.model.model_cleared.connect(self.on_model_cleared)
         self.model.node_position_changed.connect(self.on_node_position_changed)
+        # Setting changes are forwarded to the affected node item only, rather than
+        # connecting every node item to the model and letting each check the node ID.
+        self.model.node_setting_changed.connect(self.on_node_setting_changed)
+        self.model.node_settings_changed.connect(self.on_node_settings_changed)
+
+    def update_connections_later(self, connections: list[NodeConnection]):
+        """Schedules rebuilding the paths of the given connections."""
+        if connections:
+            self._dirty_connections.update(connections)
+            if not self._connection_update_timer.isActive():
+                self._connection_update_timer.start()
+
+    def _update_dirty_connections(self):
+        dirty_connections, self._dirty_connections = self._dirty_connections, set()
+        for connection in dirty_connections:
+            if connection.scene() is self:  # It may have been deleted in the meantime
+                connection.update_path()
 
     def select_node_item(self, node_to_select: Optional[NodeBase]):
         """
@@ -459,6 +641,7 @@ class NodeScene(QGraphicsScene):
         if isinstance(item, NodeSocket):
             self.start_socket = item
             self.temp_connection = QGraphicsPathItem()
+            self._temp_connection_end = None
             self.temp_connection.setPen(QPen(QColor(Qt.GlobalColor.darkYellow), 2, Qt.PenStyle.DashLine))
             self.temp_connection.setZValue(-1)  # Ensure it's drawn under the sockets
             self.addItem(self.temp_connection)
@@ -469,32 +652,24 @@ class NodeScene(QGraphicsScene):
 
     def mouseMoveEvent(self, event: QGraphicsSceneMouseEvent):
         if self.temp_connection and self.start_socket:
-            p1 = self.start_socket.scenePos()  # type: ignore
             p2 = event.scenePos()
-            path = QPainterPath(p1)
-            ctr1 = QPointF(p1.x() + 50, p1.y())
-            ctr2 = QPointF(p2.x() - 50, p2.y())
-            path.cubicTo(ctr1, ctr2, p2)
-            self.temp_connection.setPath(path)
+            if p2 != self._temp_connection_end:
+                self._temp_connection_end = p2
+                self.temp_connection.setPath(NodeConnection.build_path(self.start_socket.scene_point(), p2))
         super().mouseMoveEvent(event)
 
     def mouseReleaseEvent(self, event: QGraphicsSceneMouseEvent):
         if self.temp_connection and self.start_socket:
             self.socket_active = False
 
-            end_item: Optional[NodeSocket] = next(
-                (i for i in self.items(event.scenePos())
-                 if isinstance(i, NodeSocket)
-                 and i is not self.start_socket
-                 and i.socket_type == self.start_socket.socket_type
-                 and i.is_input != self.start_socket.is_input),
-                 None
-            )
-            if isinstance(end_item, NodeSocket) and end_item != self.start_socket:
+            # Sockets are drawn above their node and the connections, so a socket under the
+            # cursor is always the topmost item there.
+            end_item = self.itemAt(event.scenePos(), QTransform())
+            if isinstance(end_item, NodeSocket) and end_item is not self.start_socket:
                 if (
                     self.start_socket.socket_type == end_item.socket_type and
                     self.start_socket.is_input != end_item.is_input and
-                    self.start_socket.parentItem() != end_item.parentItem()  # type: ignore
+                    self.start_socket.parentItem() is not end_item.parentItem()  # type: ignore
                 ):
                     # Determine which socket is the output (from) and which is the input (to)
                     from_socket = self.start_socket if not self.start_socket.is_input else end_item
@@ -514,36 +689,38 @@ class NodeScene(QGraphicsScene):
         super().mouseReleaseEvent(event)
 
     def contextMenuEvent(self, event: QGraphicsSceneContextMenuEvent):
-        item = self.itemAt(event.scenePos(), QTransform())
-        print('item:', item)
-        
         # check if we should pass the context menu event to a Node
-        for item in self.items(event.scenePos()):
-            print('item:', item)
-            while item:
-                if isinstance(item, NodeBase):
-                    item.contextMenuEvent(event)
-                    return
-                item = item.parentItem()
-        
-        menu = QMenu()
-
-        # title
-        title_action = menu.addAction("Add Node")
-        title_action.setEnabled(False)
-        font = title_action.font()
-        font.setBold(True)
-        title_action.setFont(font)
-
-        menu.addSeparator()
-
-        # node options
-        add_loader_action = menu.addAction("Load Image Node")
-        add_black_action = menu.addAction("Black Levels Node")
-
-        add_loader_action.triggered.connect(lambda: self.controller.add_node("ImageLoader", event.scenePos()))
-        add_black_action.triggered.connect(lambda: self.controller.add_node("BlackLevels", event.scenePos()))
-        menu.exec(event.screenPos())
+        item = self.itemAt(event.scenePos(), QTransform())
+        while item:
+            if isinstance(item, NodeBase):
+                item.contextMenuEvent(event)
+                return
+            item = item.parentItem()
+
+        # The node options carry the type of the node they add as their data
+        action = self._get_context_menu().exec(event.screenPos())
+        if action is not None and action.data():
+            self.controller.add_node(action.data(), event.scenePos())
+
+    def _get_context_menu(self) -> QMenu:
+        """Returns the scene's "Add Node" context menu, creating it on first use."""
+        if self._context_menu is None:
+            menu = QMenu()
+
+            # title
+            title_action = menu.addAction("Add Node")
+            title_action.setEnabled(False)
+            font = title_action.font()
+            font.setBold(True)
+            title_action.setFont(font)
+
+            menu.addSeparator()
+
+            # node options
+            menu.addAction("Load Image Node").setData("ImageLoader")
+            menu.addAction("Black Levels Node").setData("BlackLevels")
+            self._context_menu = menu
+        return self._context_menu
 
     def on_connection_added(self, conn_data: dict):
         """Slot to handle when a connection is added to the model."""
@@ -556,8 +733,8 @@ class NodeScene(QGraphicsScene):
             from_node = self.node_items[from_node_id]
             to_node = self.node_items[to_node_id]
 
-            start_socket = next((s for s in from_node.outputs if s.name == from_socket_name), None)
-            end_socket = next((s for s in to_node.inputs if s.name == to_socket_name), None)
+            start_socket = from_node.outputs_by_name.get(from_socket_name)
+            end_socket = to_node.inputs_by_name.get(to_socket_name)
 
             if start_socket and end_socket:
                 connection = NodeConnection(start_socket, end_socket)
@@ -567,7 +744,7 @@ class NodeScene(QGraphicsScene):
                 end_socket.add_connection(connection)
 
                 # Store for later removal
-                key = frozenset(conn_data.items())
+                key = Connection.from_dict(conn_data)
                 connection.conn_data = conn_data
                 self.connection_items[key] = connection
 
@@ -579,16 +756,49 @@ class NodeScene(QGraphicsScene):
 
     def on_connection_removed(self, conn_data: dict):
         """Slot to handle when a connection is removed from the model."""
-        key = frozenset(conn_data.items())
+        key = Connection.from_dict(conn_data)
         if key in self.connection_items:
             connection = self.connection_items.pop(key)
             connection.delete()
 
     def on_node_added(self, node_id: str):
         """Slot to handle when a node is added to the model."""
+        node_item = self._create_node_item(node_id)
+        if node_item:
+            # Automatically select the new node and update the side panel
+            self.select_node_item(node_item)
+
+    def on_graph_loaded(self):
+        """Slot to build all items at once after the model was loaded from a file."""
+        # Unlike on_node_added, this doesn't select each node (which would build every
+        # node's settings panel). MainWindow.open_project restores the saved selection.
+        for node_id in self.model.nodes:
+            self._create_node_item(node_id)
+
+        for conn_data in self.model.connections.values():
+            self.on_connection_added(conn_data)
+
+    def on_model_cleared(self):
+        """Slot to remove all items at once when the model has been cleared."""
+        had_selection = bool(self.selectedItems())
+
+        self.node_items = {}
+        self.connection_items = {}
+        self._dirty_connections = set()
+        self.temp_connection = None
+        self.start_socket = None
+        self.socket_active = False
+        # Removes and deletes all items (nodes with their sockets, connections) in one go
+        self.clear()
+
+        if had_selection:
+            self.node_selected.emit(None)
+
+    def _create_node_item(self, node_id: str) -> Optional[NodeBase]:
+        """Creates the graphics item of a node in the model and adds it to the scene."""
         node_data = self.model.nodes[node_id]
-        node_type = node_data["type"]
-        position = QPointF(*node_data["position"])
+        node_type = node_data.type
+        position = QPointF(*node_data.position)
 
         # This will be replaced by the node registry later.
         node_class = {"ImageLoader": NodeImageLoader, "BlackLevels": NodeBlackLevels}.get(node_type)
@@ -599,15 +809,24 @@ class NodeScene(QGraphicsScene):
             node_item.setPos(position)
             self.addItem(node_item)
             self.node_items[node_id] = node_item
-            self.model.node_setting_changed.connect(node_item.on_setting_changed)
             
-            for key, value in node_data.get("settings", {}).items():
+            for key, value in node_data.settings.items():
                 node_item.on_setting_changed(node_id, key, value)
 
-            # Automatically select the new node and update the side panel
-            self.clearSelection()
-            node_item.setSelected(True)
-            self.node_selected.emit(node_item)
+            return node_item
+        return None
+
+    def on_node_setting_changed(self, node_id: str, key: str, value: object):
+        """Slot to forward a setting change in the model to the node's item."""
+        node_item = self.node_items.get(node_id)
+        if node_item is not None:
+            node_item.on_setting_changed(node_id, key, value)
+
+    def on_node_settings_changed(self, node_id: str, settings: dict):
+        """Slot to forward several setting changes in the model to the node's item."""
+        node_item = self.node_items.get(node_id)
+        if node_item is not None:
+            node_item.on_settings_changed(node_id, settings)
 
     def on_node_removed(self, node_id: str):
         """Slot to handle when a node is removed from the model."""
@@ -617,7 +836,6 @@ class NodeScene(QGraphicsScene):
             # Check if the item to be removed is currently selected.
             is_selected = node_item.isSelected()
 
-            self.model.node_setting_changed.disconnect(node_item.on_setting_changed)
             node_item.delete_node()  # Use the node's own cleanup method
 
             # If the deleted node was selected, clear the side panel.
@@ -635,12 +853,35 @@ class NodeScene(QGraphicsScene):
 
 
 class NodeView(QGraphicsView):
+    # While a mouse button is held (panning, dragging nodes or connections) only the dragged
+    # items and their connections change in a small graph, so Qt repaints just their
+    # regions. In a large graph many items change with every mouse move, and it's cheaper
+    # to repaint the whole viewport than to compute dirty regions. Otherwise the bounding
+    # rect of the changed regions is repainted, which avoids unioning many small rects.
+    IDLE_UPDATE_MODE = QGraphicsView.ViewportUpdateMode.BoundingRectViewportUpdate
+    INTERACTION_UPDATE_MODE = QGraphicsView.ViewportUpdateMode.SmartViewportUpdate
+    LARGE_GRAPH_UPDATE_MODE = QGraphicsView.ViewportUpdateMode.FullViewportUpdate
+    LARGE_GRAPH_NODE_COUNT = 100
+
     def __init__(self, scene):
         super().__init__(scene)
 
-        self.viewport().setAutoFillBackground(False)
-        self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.FullViewportUpdate)
-        self.setRenderHints(self.renderHints() | QPainter.RenderHint.Antialiasing)
+        # Whether the view is rendered with OpenGL (see _use_opengl_viewport)
+        self._opengl_viewport = False
+        if HAS_OPENGL:
+            self._use_opengl_viewport()
+        else:
+            self._use_raster_viewport()
+        # Antialiasing roughly doubles the fill cost of every paint, so it's off by default
+        # and can be turned on from the View menu (see MainWindow.set_node_antialiasing).
+        self.setRenderHints(QPainter.RenderHint.TextAntialiasing)
+        # All item paint() methods set their own pen and brush, so the painter state doesn't
+        # need saving/restoring around each item. Node drawing is clipped to the bounding
+        # rect by their device coordinate cache, so no extra antialiasing margin is needed.
+        self.setOptimizationFlags(
+            QGraphicsView.OptimizationFlag.DontSavePainterState
+            | QGraphicsView.OptimizationFlag.DontAdjustForAntialiasing
+        )
         self._zoom = 1.0
         self._zoom_range = (0.5, 2.0)
         self._zoom_in_factor = 1.15
@@ -649,6 +890,53 @@ class NodeView(QGraphicsView):
         self._pan_start = QPointF()
         self.setDragMode(QGraphicsView.DragMode.NoDrag)
 
+    def _use_opengl_viewport(self):
+        """Renders the view with OpenGL, so that filling and antialiasing are done on the GPU."""
+        gl_widget = QOpenGLWidget()
+        surface_format = QSurfaceFormat()
+        surface_format.setSamples(4)  # QPainter's antialiasing on OpenGL relies on multisampling
+        gl_widget.setFormat(surface_format)
+        self.setViewport(gl_widget)
+        self._opengl_viewport = True
+        self.viewport().setAutoFillBackground(False)
+        self.setViewportUpdateMode(self._viewport_update_mode(interacting=False))
+
+    def _use_raster_viewport(self):
+        """Renders the view with a plain widget, e.g. when no OpenGL context can be created."""
+        if self._opengl_viewport:
+            self.setViewport(QWidget())
+            self._opengl_viewport = False
+        self.viewport().setAutoFillBackground(False)
+        self.setViewportUpdateMode(self._viewport_update_mode(interacting=False))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._opengl_viewport:
+            # The OpenGL context is only created once the viewport is shown. Check it when
+            # that has happened, as without a usable context the view would stay blank.
+            QTimer.singleShot(0, self._check_opengl_viewport)
+
+    def _check_opengl_viewport(self):
+        if not self._opengl_viewport:
+            return
+        gl_widget = cast(QOpenGLWidget, self.viewport())
+        if gl_widget.size().isEmpty():
+            return  # The context isn't created before the viewport has a size
+        context = gl_widget.context()
+        if context is None or not context.isValid():
+            print("OpenGL is not available, falling back to the raster viewport.")
+            self._use_raster_viewport()
+
+    def _viewport_update_mode(self, interacting: bool) -> QGraphicsView.ViewportUpdateMode:
+        if self._opengl_viewport:
+            # QOpenGLWidget always redraws everything, partial viewport updates don't work with it
+            return QGraphicsView.ViewportUpdateMode.FullViewportUpdate
+        if not interacting:
+            return self.IDLE_UPDATE_MODE
+        if len(self.get_scene().model.nodes) > self.LARGE_GRAPH_NODE_COUNT:
+            return self.LARGE_GRAPH_UPDATE_MODE
+        return self.INTERACTION_UPDATE_MODE
+
     def get_scene(self) -> NodeScene:
         """A type-hinted helper to get the scene as a NodeScene."""
         return cast(NodeScene, self.scene())
@@ -679,6 +967,8 @@ class NodeView(QGraphicsView):
         self.setResizeAnchor(self.ViewportAnchor.NoAnchor)
 
     def mousePressEvent(self, event: QMouseEvent):
+        self.setViewportUpdateMode(self._viewport_update_mode(interacting=True))
+
         is_middle_click = event.button() == Qt.MouseButton.MiddleButton
         is_left_background_click = (
             event.button() == Qt.MouseButton.LeftButton and
@@ -706,6 +996,9 @@ class NodeView(QGraphicsView):
         super().mouseMoveEvent(event)
 
     def mouseReleaseEvent(self, event: QMouseEvent):
+        if not event.buttons():
+            self.setViewportUpdateMode(self._viewport_update_mode(interacting=False))
+
         if self._is_panning:
             # Check if it was a click without a significant drag
             moved_distance = (event.position() - self._pan_start).manhattanLength()
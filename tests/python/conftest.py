@@ -0,0 +1,106 @@
+import struct
+
+import pytest
+
+# A minimal JPEG that starts with an Exif segment, so that LibRaw hands it out as is (it adds
+# an Exif header to JPEG thumbnails that don't have one), padded with a comment because
+# LibRaw ignores thumbnails shorter than 64 bytes.
+THUMBNAIL_JPEG = (b"\xff\xd8\xff\xe1\x00\x08Exif\x00\x00\xff\xfe\x00\x42"
+                  + b"MPR test thumbnail".ljust(64, b".") + b"\xff\xd9")
+
+
+def _pack_ifd(tags: list[tuple[int, int, str | list[int]]], offset: int, next_ifd: int) -> bytes:
+    """
+    Packs an IFD that starts at the given file offset, followed by the values that
+    don't fit into an IFD entry. Tags are (tag, type, values) with type 1: BYTE,
+    2: ASCII, 3: SHORT, 4: LONG, 10: SRATIONAL.
+    """
+    entries = []
+    for tag, tag_type, values in tags:
+        if isinstance(values, str):
+            payload = values.encode() + b"\0"
+            count = len(payload)
+        else:
+            fmt = {1: "B", 3: "H", 4: "I", 10: "i"}[tag_type]
+            payload = struct.pack(f"<{len(values)}{fmt}", *values)
+            count = len(values) // 2 if tag_type == 10 else len(values)
+        entries.append((tag, tag_type, count, payload))
+
+    data_offset = offset + 2 + 12 * len(entries) + 4
+    data = b""
+    ifd = struct.pack("<H", len(entries))
+    for tag, tag_type, count, payload in entries:
+        if len(payload) <= 4:
+            ifd += struct.pack("<HHI", tag, tag_type, count) + payload.ljust(4, b"\0")
+        else:
+            ifd += struct.pack("<HHII", tag, tag_type, count, data_offset + len(data))
+            data += payload + b"\0" * (len(payload) % 2)
+    return ifd + struct.pack("<I", next_ifd) + data
+
+
+def write_dng(path, width: int = 32, height: int = 32):
+    """Writes a minimal, uncompressed 16 bit DNG with a black image and THUMBNAIL_JPEG as thumbnail."""
+    pixels = bytes(width * height * 2)
+
+    def raw_tags(pixel_offset: int) -> list[tuple[int, int, str | list[int]]]:
+        return [
+            (254, 4, [0]),  # NewSubfileType: main image
+            (256, 4, [width]),
+            (257, 4, [height]),
+            (258, 3, [16]),  # BitsPerSample
+            (259, 3, [1]),  # Compression: none
+            (262, 3, [32803]),  # PhotometricInterpretation: CFA
+            (271, 2, "MPR"),  # Make
+            (272, 2, "Test Camera"),  # Model
+            (273, 4, [pixel_offset]),  # StripOffsets
+            (277, 3, [1]),  # SamplesPerPixel
+            (278, 4, [height]),  # RowsPerStrip
+            (279, 4, [len(pixels)]),  # StripByteCounts
+            (33421, 3, [2, 2]),  # CFARepeatPatternDim
+            (33422, 1, [0, 1, 1, 2]),  # CFAPattern: RGGB
+            (50706, 1, [1, 4, 0, 0]),  # DNGVersion
+            (50708, 2, "MPR Test Camera"),  # UniqueCameraModel
+            (50721, 10, [1, 1, 0, 1, 0, 1, 0, 1, 1, 1, 0, 1, 0, 1, 0, 1, 1, 1]),  # ColorMatrix1
+        ]
+
+    def thumbnail_tags(thumbnail_offset: int) -> list[tuple[int, int, str | list[int]]]:
+        # LibRaw only picks a thumbnail whose stated size isn't tiny compared to its bit depth
+        return [
+            (254, 4, [1]),  # NewSubfileType: reduced resolution image
+            (256, 4, [32]),
+            (257, 4, [32]),
+            (258, 3, [8]),  # BitsPerSample
+            (259, 3, [7]),  # Compression: JPEG
+            (273, 4, [thumbnail_offset]),  # StripOffsets
+            (277, 3, [3]),  # SamplesPerPixel
+            (279, 4, [len(THUMBNAIL_JPEG)]),  # StripByteCounts
+        ]
+
+    # Header, the raw image's IFD, the thumbnail's IFD, then the pixels and the thumbnail.
+    # The size of an IFD doesn't depend on its values, so pack once to get the offsets.
+    thumbnail_ifd_offset = 8 + len(_pack_ifd(raw_tags(0), 8, 0))
+    pixel_offset = thumbnail_ifd_offset + len(_pack_ifd(thumbnail_tags(0), thumbnail_ifd_offset, 0))
+    raw_ifd = _pack_ifd(raw_tags(pixel_offset), 8, thumbnail_ifd_offset)
+    thumbnail_ifd = _pack_ifd(thumbnail_tags(pixel_offset + len(pixels)), thumbnail_ifd_offset, 0)
+    path.write_bytes(b"II*\0" + struct.pack("<I", 8) + raw_ifd + thumbnail_ifd + pixels + THUMBNAIL_JPEG)
+
+
+@pytest.fixture
+def make_raw_file(tmp_path):
+    """Returns a function that writes a minimal DNG file with the given name and returns its path."""
+    def make(name: str = "image.dng"):
+        path = tmp_path / name
+        write_dng(path)
+        return path
+    return make
+
+
+@pytest.fixture
+def raw_file(make_raw_file):
+    return make_raw_file()
+
+
+@pytest.fixture
+def raw_file_thumbnail() -> bytes:
+    """The thumbnail embedded in the files written by raw_file and make_raw_file."""
+    return THUMBNAIL_JPEG
@@ -1,3 +1,8 @@
+import gc
+import os
+
+import pytest
+
 from mpr_photo_editor import backend
 
 
@@ -9,4 +14,77 @@ def test_get_libraw_version():
     version = backend.get_libraw_version()
     assert isinstance(version, str)
     assert len(version) > 0
-    assert "." in version
\ No newline at end of file
+    assert "." in version
+
+
+def test_loading_same_file_shares_handle(raw_file):
+    """
+    Tests that loading an unchanged file again returns the same handle, which
+    stays valid until it has been released as often as it was loaded.
+    """
+    image_id = backend.load_raw_image(str(raw_file))
+    assert backend.load_raw_image(str(raw_file)) == image_id
+    assert backend.get_metadata(image_id)["model"] == "Test Camera"
+
+    backend.release_raw_image(image_id)
+    assert backend.get_metadata(image_id)["model"] == "Test Camera"
+
+    backend.release_raw_image(image_id)
+    with pytest.raises(RuntimeError):
+        backend.get_metadata(image_id)
+
+
+def test_released_image_is_reused(raw_file):
+    """
+    Tests that a released image is handed out again when its file is loaded
+    again, unless the file has changed on disk.
+    """
+    image_id = backend.load_raw_image(str(raw_file))
+    backend.release_raw_image(image_id)
+    assert backend.load_raw_image(str(raw_file)) == image_id
+    backend.release_raw_image(image_id)
+
+    mtime = os.path.getmtime(raw_file)
+    os.utime(raw_file, (mtime + 10, mtime + 10))
+    new_image_id = backend.load_raw_image(str(raw_file))
+    assert new_image_id != image_id
+    backend.release_raw_image(new_image_id)
+
+
+def test_released_images_are_evicted(make_raw_file):
+    """
+    Tests that only the most recently released images are kept, older ones
+    are decoded again when their file is loaded.
+    """
+    paths = [make_raw_file(f"image_{i}.dng") for i in range(3)]
+    image_ids = [backend.load_raw_image(str(path)) for path in paths]
+    for image_id in image_ids:
+        backend.release_raw_image(image_id)
+
+    with pytest.raises(RuntimeError):
+        backend.get_metadata(image_ids[0])
+    reloaded_first = backend.load_raw_image(str(paths[0]))
+    reloaded_last = backend.load_raw_image(str(paths[-1]))
+    assert reloaded_first not in image_ids
+    assert reloaded_last == image_ids[-1]
+    backend.release_raw_image(reloaded_first)
+    backend.release_raw_image(reloaded_last)
+
+
+def test_thumbnail_outlives_its_image(make_raw_file, raw_file_thumbnail):
+    """
+    Tests that get_thumbnail returns a memoryview of the embedded thumbnail,
+    which stays valid after the image has been released and evicted.
+    """
+    paths = [make_raw_file(f"image_{i}.dng") for i in range(3)]
+    image_ids = [backend.load_raw_image(str(path)) for path in paths]
+    thumbnail = backend.get_thumbnail(image_ids[0])
+    assert isinstance(thumbnail, memoryview)
+    assert bytes(thumbnail) == raw_file_thumbnail
+
+    for image_id in image_ids:
+        backend.release_raw_image(image_id)
+    gc.collect()
+    with pytest.raises(RuntimeError):
+        backend.get_metadata(image_ids[0])
+    assert bytes(thumbnail) == raw_file_thumbnail
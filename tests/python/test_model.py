@@ -0,0 +1,236 @@
+import pytest
+from PySide6.QtCore import QPointF
+
+from mpr_photo_editor import backend
+from mpr_photo_editor.commands.node_commands import RemoveNodeCommand
+from mpr_photo_editor.model import Connection, Model, NodeRecord
+
+
+def _project(connections: list[dict]) -> dict:
+    return {
+        "version": "0.1.0",
+        "nodes": {
+            "a": {"type": "Blur", "position": [0.0, 0.0], "settings": {}},
+            "b": {"type": "Blur", "position": [200.0, 0.0], "settings": {}},
+        },
+        "connections": connections,
+    }
+
+
+CONNECTION = {"from_node": "a", "from_socket": "Image", "to_node": "b", "to_socket": "Image"}
+
+
+@pytest.fixture
+def model() -> Model:
+    return Model()
+
+
+def test_from_dict_skips_duplicate_connection(model: Model):
+    """
+    Tests that a project with a duplicate connection is loaded completely,
+    with the duplicate skipped.
+    """
+    loaded = []
+    model.graph_loaded.connect(lambda: loaded.append(True))
+
+    model.from_dict(_project([CONNECTION, dict(CONNECTION)]))
+
+    assert loaded == [True]
+    assert set(model.nodes) == {"a", "b"}
+    assert list(model.connections.values()) == [CONNECTION]
+    assert model.get_node_connections("a") == [CONNECTION]
+    assert model.get_node_connections("b") == [CONNECTION]
+
+
+def test_from_dict_skips_bad_connections(model: Model):
+    """
+    Tests that connections to non-existent nodes and malformed connections
+    are skipped when loading a project.
+    """
+    dangling = dict(CONNECTION, to_node="missing")
+    malformed = {"from_node": "a"}
+
+    model.from_dict(_project([dangling, malformed, CONNECTION]))
+
+    assert set(model.nodes) == {"a", "b"}
+    assert list(model.connections.values()) == [CONNECTION]
+    assert model.get_node_connections("missing") == []
+
+
+@pytest.mark.parametrize("bad_node", [
+    {"type": "Blur", "position": ["x", "y"]},
+    {"position": [0.0, 0.0]},
+    {"type": "Blur", "settings": ["radius"]},
+    5,
+])
+def test_from_dict_with_bad_node_keeps_current_graph(model: Model, bad_node: dict):
+    """
+    Tests that a project with a node that can't be read raises a ValueError
+    and leaves the current graph untouched.
+    """
+    model.from_dict(_project([CONNECTION]))
+    broken = _project([])
+    broken["nodes"]["c"] = bad_node
+
+    with pytest.raises(ValueError):
+        model.from_dict(broken)
+
+    assert set(model.nodes) == {"a", "b"}
+    assert model.nodes["b"].position == (200.0, 0.0)
+    assert list(model.connections.values()) == [CONNECTION]
+
+
+@pytest.mark.parametrize("broken", [[], {"nodes": []}, {"nodes": 5}])
+def test_from_dict_with_bad_project_keeps_current_graph(model: Model, broken):
+    """
+    Tests that a project whose root or nodes aren't a dict raises a ValueError
+    and leaves the current graph untouched.
+    """
+    model.from_dict(_project([CONNECTION]))
+
+    with pytest.raises(ValueError):
+        model.from_dict(broken)
+
+    assert set(model.nodes) == {"a", "b"}
+    assert list(model.connections.values()) == [CONNECTION]
+
+
+def test_shared_image_caches_are_kept_until_last_node_is_removed(model: Model, monkeypatch):
+    """
+    Tests that the cached thumbnail and metadata of an image handle shared by
+    several nodes are only discarded once the last of these nodes is removed.
+    """
+    released: list[int] = []
+    monkeypatch.setattr(backend, "release_raw_image", released.append)
+    for node_id in ("a", "b"):
+        settings = {"filepath": "image.nef", "raw_image_id": 7}
+        model._add_node_with_data(node_id, NodeRecord("ImageLoader", (0.0, 0.0), settings))
+    model.thumbnail_cache[7] = b"thumbnail"
+    model.metadata_cache[7] = {"make": "Camera"}
+
+    model.remove_node("a")
+    assert released == [7]
+    assert 7 in model.thumbnail_cache and 7 in model.metadata_cache
+
+    model.remove_node("b")
+    assert released == [7, 7]
+    assert 7 not in model.thumbnail_cache and 7 not in model.metadata_cache
+
+
+def test_undoing_node_removal_reacquires_shared_image(model: Model, raw_file):
+    """
+    Tests that undoing the removal of an image loader loads its image again, so that
+    removing it once more doesn't release the handle another node shares.
+    """
+    filepath = str(raw_file)
+    settings = {"filepath": filepath, "raw_image_id": backend.load_raw_image(filepath)}
+    model._add_node_with_data("a", NodeRecord("ImageLoader", (0.0, 0.0), settings))
+    command = RemoveNodeCommand(model, "a")
+    command.redo()
+    command.undo()
+
+    shared_id = backend.load_raw_image(filepath)
+    assert model.nodes["a"].settings["raw_image_id"] == shared_id
+    model._add_node_with_data("b", NodeRecord("ImageLoader", (0.0, 300.0),
+                                              {"filepath": filepath, "raw_image_id": shared_id}))
+
+    command.redo()
+    assert backend.get_metadata(shared_id)["model"] == "Test Camera"
+    model.remove_node("b")
+    with pytest.raises(RuntimeError):
+        backend.get_metadata(shared_id)
+
+
+def _assert_index_matches_connections(model: Model):
+    """Checks that the per-node connection index holds exactly the model's connections."""
+    expected: dict[str, list[dict]] = {}
+    for connection_data in model.connections.values():
+        for node_id in {connection_data["from_node"], connection_data["to_node"]}:
+            expected.setdefault(node_id, []).append(connection_data)
+    assert model._connections_by_node.keys() == expected.keys()
+    for node_id, node_connections in expected.items():
+        indexed = model._connections_by_node[node_id]
+        assert sorted(map(id, indexed)) == sorted(map(id, node_connections))
+
+
+def _add_chain(model: Model) -> list[str]:
+    """Adds three nodes a -> b -> c, with a also connected to c, and returns their IDs."""
+    node_ids = [model.add_node("Blur", QPointF(x, 0.0)) for x in (0.0, 200.0, 400.0)]
+    a, b, c = node_ids
+    model.add_connection(a, "Image", b, "Image")
+    model.add_connection(b, "Image", c, "Image")
+    model.add_connection(a, "Image", c, "Mask")
+    return node_ids
+
+
+def test_connection_index_follows_added_and_removed_connections(model: Model):
+    """
+    Tests that adding and removing connections keeps the per-node index
+    consistent with the model's connections.
+    """
+    a, b, c = _add_chain(model)
+    _assert_index_matches_connections(model)
+    assert len(model.get_node_connections(a)) == 2
+    assert len(model.get_node_connections(b)) == 2
+
+    model.remove_connection({"from_node": a, "from_socket": "Image", "to_node": b, "to_socket": "Image"})
+    _assert_index_matches_connections(model)
+    assert model.get_node_connections(b) == [
+        {"from_node": b, "from_socket": "Image", "to_node": c, "to_socket": "Image"}]
+
+    for connection_data in model.get_node_connections(c):
+        model.remove_connection(connection_data)
+    _assert_index_matches_connections(model)
+    assert model._connections_by_node == {}
+
+
+def test_connection_index_follows_node_removal_and_undo(model: Model):
+    """
+    Tests that removing a node drops its connections from the index, and that
+    undoing the removal restores them.
+    """
+    a, b, _ = _add_chain(model)
+    connections_before = dict(model.connections)
+    command = RemoveNodeCommand(model, b)
+
+    command.redo()
+    _assert_index_matches_connections(model)
+    assert model.get_node_connections(b) == []
+    assert len(model.get_node_connections(a)) == 1
+
+    command.undo()
+    _assert_index_matches_connections(model)
+    assert model.connections == connections_before
+    assert len(model.get_node_connections(b)) == 2
+
+    command.redo()
+    _assert_index_matches_connections(model)
+    assert b not in model.nodes
+
+
+def test_connections_are_keyed_by_connection(model: Model):
+    """
+    Tests that connections are found by value, that duplicates are rejected
+    without changing the model, and that they are saved in insertion order.
+    """
+    a, b, _ = _add_chain(model)
+    duplicate = {"from_node": a, "from_socket": "Image", "to_node": b, "to_socket": "Image"}
+    assert Connection.from_dict(duplicate) in model.connections
+
+    with pytest.raises(ValueError):
+        model.add_connection(**duplicate)
+    with pytest.raises(ValueError):
+        model.add_connections([{"from_node": b, "from_socket": "Image", "to_node": a, "to_socket": "Image"},
+                               duplicate])
+    assert len(model.connections) == 3
+    _assert_index_matches_connections(model)
+
+    # An equal dict, not the stored one, removes the connection
+    model.remove_connection(dict(duplicate))
+    assert Connection.from_dict(duplicate) not in model.connections
+    with pytest.raises(ValueError):
+        model.remove_connection(duplicate)
+
+    model.add_connection(**duplicate)
+    assert model.to_dict()["connections"][-1] == duplicate
+    _assert_index_matches_connections(model)